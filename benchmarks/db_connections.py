@@ -0,0 +1,133 @@
+"""
+Latency of the feed with a new database connection per request, with
+persistent connections (CONN_MAX_AGE) and with the psycopg 3 pool
+(DATABASE_POOL, skipped when psycopg_pool is not installed).
+
+Every mode starts gunicorn (gunicorn.conf.py, one worker with
+--threads threads) against the database of the current environment, meant
+to be PostgreSQL, e.g. DATABASE_URL=postgres://postgres@localhost/whistly.
+
+    python benchmarks/db_connections.py [--requests 1000] [--concurrency 4]
+                                        [--threads 4] [--path /birds_nest/]
+"""
+
+import argparse
+import http.client
+import importlib.util
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "connection per request": {"CONN_MAX_AGE": "0", "DATABASE_POOL": "False"},
+    "persistent, 60s": {"CONN_MAX_AGE": "60", "DATABASE_POOL": "False"},
+    "pool": {"DATABASE_POOL": "True"},
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, threads, settings):
+    hosts = os.environ.get("ALLOWED_HOSTS", "localhost")
+    env = dict(
+        os.environ,
+        DEBUG="False",
+        PORT=str(port),
+        WEB_CONCURRENCY="1",
+        GUNICORN_THREADS=str(threads),
+        ALLOWED_HOSTS=f"{hosts},127.0.0.1",
+        **settings,
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "whistly.wsgi"],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit("gunicorn did not start")
+
+
+def worker(port, path, count, latencies):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            sys.exit(f"{path} answered {response.status}")
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def run(port, path, requests, concurrency):
+    # warm up: imports, templates and, when they are kept, the connections
+    worker(port, path, 20, [])
+    latencies = []
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(port, path, requests // concurrency, latencies),
+        )
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    return (
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--path", default="/birds_nest/")
+    args = parser.parse_args()
+
+    print(
+        f"{args.requests} requests on {args.path}, "
+        f"{args.concurrency} clients, "
+        f"1 gunicorn worker with {args.threads} threads\n"
+    )
+    print(f"{'mode':<24} {'p50':>9} {'p99':>9}")
+    for name, settings in MODES.items():
+        pool = settings["DATABASE_POOL"] == "True"
+        if pool and importlib.util.find_spec("psycopg_pool") is None:
+            print(f"{name:<24} skipped, psycopg[pool] is not installed")
+            continue
+        port = free_port()
+        server = start_server(port, args.threads, settings)
+        try:
+            p50, p99 = run(port, args.path, args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:<24} {p50:>7.2f}ms {p99:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
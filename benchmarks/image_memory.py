@@ -0,0 +1,138 @@
+"""
+Peak memory per processed upload: the old in-memory pipeline (full decode,
+every width resized from the full image, encoded into BytesIO) against
+birds.images.build_renditions (draft decoding, cascading resize, spooled
+output).
+
+Every measurement runs in a fresh process so the peak RSS is not shared.
+
+    python benchmarks/image_memory.py [--image some.jpg] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def peak_rss_kb():
+    """
+    High water mark of this process' resident memory. On Linux ru_maxrss
+    survives exec (it would report the parent's peak), VmHWM does not.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def in_memory_pipeline(path):
+    from PIL import Image
+
+    from birds.images import RENDITION_FORMATS, RENDITION_WIDTHS
+
+    source = Image.open(path).convert("RGB")
+    for width in RENDITION_WIDTHS:
+        height = round(source.height * width / source.width)
+        resized = source.resize((width, height), Image.Resampling.LANCZOS)
+        for _, image_format, options in RENDITION_FORMATS:
+            output = BytesIO()
+            resized.save(output, format=image_format, **options)
+            output.getvalue()
+
+
+def streaming_pipeline(path):
+    from django.conf import settings
+    from django.core.files.storage import FileSystemStorage
+    from PIL import Image
+
+    from birds.images import build_renditions
+
+    settings.configure()
+    with tempfile.TemporaryDirectory() as location:
+        storage = FileSystemStorage(location=location)
+        with open(path, "rb") as picture:
+            build_renditions(Image.open(picture), "benchmark", storage)
+
+
+PIPELINES = {
+    "in_memory": in_memory_pipeline,
+    "streaming": streaming_pipeline,
+}
+
+
+def child(pipeline, path):
+    # import everything first so only the image work counts in the peak
+    import django.core.files.storage  # noqa: F401
+    import PIL.Image  # noqa: F401
+
+    import birds.images  # noqa: F401
+
+    before = peak_rss_kb()
+    start = time.perf_counter()
+    PIPELINES[pipeline](path)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"peak_kb": peak_rss_kb() - before, "seconds": elapsed}))
+
+
+def make_sample(path, size=(6000, 4000)):
+    """
+    A large noisy JPEG, comparable to a full resolution camera picture.
+    """
+    from PIL import Image
+
+    Image.effect_noise(size, 64).convert("RGB").save(path, quality=90)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--image",
+        help="JPEG to process, defaults to a 24MP sample",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(*args.child)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = args.image
+        if path is None:
+            path = os.path.join(workdir, "sample.jpg")
+            make_sample(path)
+        print(f"Image: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+        for pipeline in PIPELINES:
+            results = [
+                json.loads(
+                    subprocess.check_output(
+                        [sys.executable, __file__, "--child", pipeline, path]
+                    )
+                )
+                for _ in range(args.runs)
+            ]
+            peak = max(result["peak_kb"] for result in results) / 1024
+            seconds = min(result["seconds"] for result in results)
+            print(
+                f"{pipeline:>10}: peak +{peak:7.1f} MB RSS, "
+                f"{seconds:.2f}s per upload"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Load test of the public pages as an anonymous visitor: requests/sec and
+latency of the home page and the feed with the anonymous page cache off,
+on, and on with conditional requests (If-None-Match, answered with 304).
+
+Each run starts its own gunicorn (whistly.wsgi) with ANONYMOUS_PAGE_CACHE
+set accordingly and DEBUG off, using the settings/database of the current
+environment.
+
+    python benchmarks/load_test.py [--requests 2000] [--concurrency 16]
+                                   [--workers 2] [--paths / /birds_nest/]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    # name: (ANONYMOUS_PAGE_CACHE, send If-None-Match)
+    "no cache": (False, False),
+    "page cache": (True, False),
+    "page cache + 304": (True, True),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, workers, page_cache):
+    hosts = os.environ.get("ALLOWED_HOSTS", "localhost")
+    env = dict(
+        os.environ,
+        DEBUG="False",
+        ANONYMOUS_PAGE_CACHE=str(page_cache),
+        ALLOWED_HOSTS=f"{hosts},127.0.0.1",
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "whistly.wsgi",
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit("gunicorn did not start")
+
+
+def worker(port, paths, count, conditional, latencies, statuses):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    etags = {}
+    for number in range(count):
+        path = paths[number % len(paths)]
+        headers = {}
+        if conditional and path in etags:
+            headers["If-None-Match"] = etags[path]
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    connection.close()
+
+
+def run(port, paths, requests, concurrency, conditional):
+    # warm up: fills the page cache and the connections of the workers
+    worker(port, paths, len(paths) * 2, False, [], {})
+    latencies, statuses = [], {}
+    per_thread = requests // concurrency
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(port, paths, per_thread, conditional, latencies, statuses),
+        )
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--paths", nargs="+", default=["/", "/birds_nest/"])
+    args = parser.parse_args()
+
+    print(
+        f"{args.requests} requests, {args.concurrency} clients, "
+        f"{args.workers} gunicorn workers, {' '.join(args.paths)}\n"
+    )
+    print(f"{'mode':<18} {'req/s':>8} {'p50':>9} {'p99':>9}  statuses")
+    for name, (page_cache, conditional) in MODES.items():
+        port = free_port()
+        server = start_server(port, args.workers, page_cache)
+        try:
+            result = run(
+                port,
+                args.paths,
+                args.requests,
+                args.concurrency,
+                conditional,
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        counts = sorted(result["statuses"].items())
+        statuses = ", ".join(f"{k}: {v}" for k, v in counts)
+        print(
+            f"{name:<18} {result['rps']:>8.0f} {result['p50']:>7.1f}ms "
+            f"{result['p99']:>7.1f}ms  {statuses}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Search benchmark: the previous icontains search (four ILIKE '%q%' ORed
+through a join on the photographer) against BirdQuerySet.search (GIN
+indexed tsvector + trigram), on PostgreSQL with synthetic birds.
+
+    python benchmarks/search.py [--rows 1000000] [--repeat 5] [--keep]
+
+The synthetic birds belong to a "search-benchmark" user and are removed at
+the end unless --keep is given (then they are reused by the next run).
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "whistly.settings")
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Q  # noqa: E402
+
+from birds.models import Bird  # noqa: E402
+
+USERNAME = "search-benchmark"
+
+SPECIES = [
+    "robin", "sparrow", "blue jay", "kingfisher", "heron", "magpie", "swallow",
+    "goldfinch", "woodpecker", "starling", "barn owl", "seagull", "pigeon",
+    "egret", "cormorant", "kestrel", "wren", "nuthatch", "blackbird", "crane",
+]  # fmt: skip
+PLACES = [
+    "lisbon", "porto", "london", "dublin", "madrid", "toronto", "lima",
+    "quito", "oslo", "cairo", "harbour", "river bank", "city park", "forest",
+    "wetlands", "garden", "beach", "mountain trail", "lake shore", "farm",
+]  # fmt: skip
+WORDS = [
+    "singing", "feeding", "nesting", "flying", "resting", "early", "morning",
+    "evening", "rain", "sunny", "close", "shy", "curious", "young", "pair",
+    "flock", "branch", "fence", "roof", "water",
+]  # fmt: skip
+
+QUERIES = ["kingfisher", "lisbon", "singing", "kingfsher", "blue jay harbour"]
+
+INSERT_SQL = """
+INSERT INTO birds_bird (
+    id, created, modified, species, location, picture, photographer_id,
+    photographer_comment, renditions, picture_status, orientation,
+    seed_count, approved_comment_count
+)
+SELECT
+    gen_random_uuid(),
+    now() - (n || ' minutes')::interval,
+    now(),
+    initcap((%(species)s::text[])[1 + n %% 20]) || ' ' || n,
+    initcap((%(places)s::text[])[1 + (n / 20) %% 20]),
+    'test_birds/bird_one.jpg',
+    %(photographer)s,
+    array_to_string(ARRAY[
+        (%(words)s::text[])[1 + n %% 19],
+        (%(words)s::text[])[1 + n %% 17],
+        (%(words)s::text[])[1 + n %% 13]
+    ], ' '),
+    '{}',
+    'ready',
+    0,
+    n %% 50,
+    n %% 7
+FROM generate_series(%(start)s, %(stop)s) AS n
+"""
+
+
+def icontains_search(query):
+    return Bird.objects.filter(
+        Q(photographer__username__icontains=query)
+        | Q(species__icontains=query)
+        | Q(photographer_comment__icontains=query)
+        | Q(location__icontains=query)
+    )
+
+
+def seed(rows):
+    photographer, _ = get_user_model().objects.get_or_create(
+        username=USERNAME, defaults={"email": "search-benchmark@example.com"}
+    )
+    existing = Bird.objects.filter(photographer=photographer).count()
+    batch = 100_000
+    start = time.perf_counter()
+    with connection.cursor() as cursor:
+        for first in range(existing, rows, batch):
+            cursor.execute(
+                INSERT_SQL,
+                {
+                    "species": SPECIES,
+                    "places": PLACES,
+                    "words": WORDS,
+                    "photographer": photographer.pk,
+                    "start": first,
+                    "stop": min(first + batch, rows) - 1,
+                },
+            )
+            print(f"  {min(first + batch, rows):>9} birds", flush=True)
+        cursor.execute("ANALYZE birds_bird")
+    if rows > existing:
+        elapsed = time.perf_counter() - start
+        print(f"Inserted {rows - existing} birds in {elapsed:.0f}s")
+    return photographer
+
+
+def plan(queryset):
+    """
+    Scan types of the query plan, to spot sequential scans at a glance.
+    """
+    nodes = set()
+    for line in queryset.explain().splitlines():
+        for node in (
+            "Seq Scan",
+            "Index Scan",
+            "Bitmap Index Scan",
+            "Index Only Scan",
+        ):
+            if node in line:
+                nodes.add(node)
+    return ", ".join(sorted(nodes))
+
+
+def timed(queryset, repeat):
+    """
+    What SearchResultsListView does per request: the count of the paginator
+    and the first page of 10 results.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = queryset.count()
+        list(queryset[:10])
+        timings.append((time.perf_counter() - start) * 1000)
+    return count, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        sys.exit("This benchmark needs PostgreSQL.")
+
+    photographer = seed(args.rows)
+    try:
+        header = f"{'query':<18} {'path':<10} {'matches':>8} {'median':>10}"
+        print(f"\n{header}  plan")
+        for query in QUERIES:
+            for name, queryset in (
+                ("icontains", icontains_search(query)),
+                ("fulltext", Bird.objects.search(query)),
+            ):
+                count, median = timed(queryset, args.repeat)
+                print(
+                    f"{query:<18} {name:<10} {count:>8} {median:>8.1f}ms  "
+                    f"{plan(queryset)}"
+                )
+    finally:
+        if not args.keep:
+            # synthetic birds have no comments/seeds, skip the ORM collector
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM birds_bird WHERE photographer_id = %s",
+                    [photographer.pk],
+                )
+            photographer.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Cold start and throughput of the container command: the old entrypoint
+(makemigrations, migrate, then runserver on every boot) against gunicorn
+with gunicorn.conf.py.
+
+Cold start is the time from spawning the command to the first 200 of the
+home page, throughput is measured on --path with --concurrency keep-alive
+clients. The makemigrations of the old entrypoint runs with --dry-run so
+the benchmark never writes migration files.
+
+Uses the settings/database of the current environment, DEBUG is turned off.
+
+    python benchmarks/server_startup.py [--requests 1000] [--concurrency 16]
+                                        [--path /birds_nest/]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def commands(port):
+    manage = f"{sys.executable} manage.py"
+    return {
+        "old entrypoint (runserver)": [
+            "sh",
+            "-c",
+            f"{manage} makemigrations --dry-run && {manage} migrate && "
+            f"{manage} runserver --noreload 127.0.0.1:{port}",
+        ],
+        "gunicorn.conf.py": [sys.executable, "-m", "gunicorn", "whistly.wsgi"],
+    }
+
+
+def wait_for_home(port, timeout=120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            connection = http.client.HTTPConnection(
+                "127.0.0.1",
+                port,
+                timeout=5,
+            )
+            connection.request("GET", "/")
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def worker(port, path, count, latencies):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for _ in range(count):
+        start = time.perf_counter()
+        connection.request("GET", path)
+        connection.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def throughput(port, path, requests, concurrency):
+    latencies = []
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(port, path, requests // concurrency, latencies),
+        )
+        for _ in range(concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        statistics.median(latencies) * 1000,
+        latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--path", default="/birds_nest/")
+    args = parser.parse_args()
+
+    print(
+        f"{args.requests} requests on {args.path}, "
+        f"{args.concurrency} clients, {os.cpu_count()} CPUs\n"
+    )
+    header = f"{'command':<28} {'cold start':>10} {'req/s':>8}"
+    print(f"{header} {'p50':>9} {'p99':>9}")
+    for name in commands(0):
+        port = free_port()
+        hosts = os.environ.get("ALLOWED_HOSTS", "localhost")
+        env = dict(
+            os.environ,
+            DEBUG="False",
+            PORT=str(port),
+            ALLOWED_HOSTS=f"{hosts},127.0.0.1",
+        )
+        start = time.perf_counter()
+        server = subprocess.Popen(
+            commands(port)[name],
+            cwd=BASE_DIR,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        try:
+            if not wait_for_home(port):
+                sys.exit(f"{name} did not start")
+            cold_start = time.perf_counter() - start
+            rps, p50, p99 = throughput(
+                port,
+                args.path,
+                args.requests,
+                args.concurrency,
+            )
+        finally:
+            # the whole group, sh -c does not forward the signal
+            os.killpg(server.pid, 15)
+            server.wait()
+        timing = f"{cold_start:>9.2f}s {rps:>8.0f}"
+        print(f"{name:<28} {timing} {p50:>7.1f}ms {p99:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+How many concurrent slow clients one server handles: gunicorn sync workers
+(whistly.wsgi) against a single uvicorn process with the async views
+(whistly.asgi, ASYNC_VIEWS=True).
+
+Every slow client trickles its request headers over --slowness seconds and
+then reads the response in small pieces, like a phone on a bad network.
+While they are connected a fast client keeps requesting the page, its
+latency shows whether the server can still answer anybody.
+
+Uses the settings/database of the current environment, DEBUG is turned off.
+
+    python benchmarks/slow_clients.py [--clients 50] [--slowness 2]
+                                      [--workers 2] [--path /birds_nest/]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, async_views):
+    hosts = os.environ.get("ALLOWED_HOSTS", "localhost")
+    env = dict(
+        os.environ,
+        DEBUG="False",
+        ASYNC_VIEWS=str(async_views),
+        ALLOWED_HOSTS=f"{hosts},127.0.0.1",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", *command],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    sys.exit(f"{command[0]} did not start")
+
+
+def slow_client(port, path, slowness, results):
+    start = time.perf_counter()
+    try:
+        address = ("127.0.0.1", port)
+        with socket.create_connection(address, timeout=120) as sock:
+            request = (
+                f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                "User-Agent: slow-client\r\nAccept: text/html\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            pieces = 10
+            step = len(request) // pieces + 1
+            for offset in range(0, len(request), step):
+                end = offset + step
+                sock.sendall(request[offset:end])
+                time.sleep(slowness / pieces)
+            received = b""
+            while chunk := sock.recv(1024):
+                received += chunk
+                time.sleep(0.005)
+        ok = received.startswith(b"HTTP/1.1 200")
+    except OSError:
+        ok = False
+    results.append((ok, time.perf_counter() - start))
+
+
+def probe(port, path, stop, latencies, failures):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection(
+                "127.0.0.1",
+                port,
+                timeout=60,
+            )
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status != 200:
+                failures.append(response.status)
+        except OSError as error:
+            failures.append(error)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.1)
+
+
+def run(port, path, clients, slowness):
+    results, latencies, failures = [], [], []
+    stop = threading.Event()
+    prober = threading.Thread(
+        target=probe, args=(port, path, stop, latencies, failures)
+    )
+    threads = [
+        threading.Thread(
+            target=slow_client,
+            args=(port, path, slowness, results),
+        )
+        for _ in range(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    prober.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    latencies.sort()
+    return {
+        "served": sum(ok for ok, _ in results),
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "max": latencies[-1] * 1000,
+        "probes": len(latencies),
+        "failures": len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--slowness", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--path", default="/birds_nest/")
+    args = parser.parse_args()
+
+    servers = {
+        f"gunicorn, {args.workers} sync workers": (
+            ["gunicorn", "whistly.wsgi", "--workers", str(args.workers)],
+            False,
+        ),
+        "uvicorn, 1 process": (["uvicorn", "whistly.asgi:application"], True),
+    }
+    print(
+        f"{args.clients} slow clients ({args.slowness}s to send the request) "
+        f"on {args.path}\n"
+    )
+    print(
+        f"{'server':<28} {'served':>7} {'all done':>9} "
+        f"{'probe p50':>10} {'probe max':>10}"
+    )
+    for name, (command, async_views) in servers.items():
+        port = free_port()
+        if command[0] == "gunicorn":
+            command = command + [
+                "--bind",
+                f"127.0.0.1:{port}",
+                "--log-level",
+                "warning",
+            ]
+        else:
+            command = command + ["--port", str(port), "--log-level", "warning"]
+        server = start_server(command, port, async_views)
+        try:
+            result = run(port, args.path, args.clients, args.slowness)
+        finally:
+            server.terminate()
+            server.wait()
+        failed = result["failures"]
+        print(
+            f"{name:<28} {result['served']:>4}/{args.clients:<2} "
+            f"{result['elapsed']:>8.1f}s {result['p50']:>8.0f}ms "
+            f"{result['max']:>8.0f}ms"
+            + (f"  ({failed} probes failed)" if failed else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Bird, Comment, Reply, Seed
+from .models import Bird, Comment, ImageJob, Reply, Seed
 
 # Register your models here.
 
@@ -20,6 +20,7 @@ class CustomAdminBird(admin.ModelAdmin):
         "location",
         "picture",
         "photographer",
+        "picture_status",
         "created",
     )
 
@@ -50,6 +51,18 @@ class CustomAdminSeed(admin.ModelAdmin):
     )
 
 
+class CustomAdminImageJob(admin.ModelAdmin):
+    list_display = (
+        "kind",
+        "bird",
+        "status",
+        "attempts",
+        "created",
+    )
+    list_filter = ("status", "kind")
+
+
 admin.site.register(Bird, CustomAdminBird)
 admin.site.register(Comment, CustomAdminComment)
 admin.site.register(Seed, CustomAdminSeed)
+admin.site.register(ImageJob, CustomAdminImageJob)
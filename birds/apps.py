@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class BirdsConfig(AppConfig):
     name = "birds"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,80 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+# The {% cache %} fragments of a bird (bird_detail.html, bird_list.html) are
+# keyed on the bird's version: replacing the version makes every fragment of
+# the bird stale at once, the old entries simply expire.
+VERSION_KEY = "bird-version:{}"
+
+
+def bird_versions(bird_ids):
+    """
+    {bird pk: version} for the given birds, in a single cache round trip.
+    A bird without a version (never rendered, bumped or evicted) gets a new
+    one, so a lost version can never bring back an old fragment.
+    """
+    keys = {VERSION_KEY.format(pk): pk for pk in bird_ids}
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+async def abird_versions(bird_ids):
+    """
+    bird_versions() with the async cache API, for the async views.
+    """
+    keys = {VERSION_KEY.format(pk): pk for pk in bird_ids}
+    versions = await cache.aget_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def attach_cache_versions(birds):
+    """
+    Sets bird.cache_version, used as vary_on of the fragments.
+    """
+    versions = bird_versions([bird.pk for bird in birds])
+    for bird in birds:
+        bird.cache_version = versions[bird.pk]
+    return birds
+
+
+async def aattach_cache_versions(birds):
+    versions = await abird_versions([bird.pk for bird in birds])
+    for bird in birds:
+        bird.cache_version = versions[bird.pk]
+    return birds
+
+
+def bump_bird_versions(*bird_ids):
+    """
+    Invalidates the fragments of the birds once the transaction commits, a
+    page rendered in between would otherwise cache the old data under the
+    new version.
+    """
+    keys = [VERSION_KEY.format(pk) for pk in bird_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+# when the public feed last changed, the validator (ETag/Last-Modified) of the
+# anonymous page cache (pages/middleware.py)
+FEED_KEY = "feed-last-modified"
+
+
+def touch_feed():
+    """
+    Marks the feed as changed once the transaction commits: a bird was
+    added, edited, deleted or got its renditions.
+    """
+    transaction.on_commit(
+        lambda: cache.set(FEED_KEY, timezone.now(), timeout=None),
+    )
@@ -1,6 +1,7 @@
 from django import forms
 
 from .models import Bird, Comment, Reply
+from .uploads import unsign_upload
 
 
 class CommentForm(forms.ModelForm):
@@ -46,3 +47,46 @@ class AddBirdForm(forms.ModelForm):
                 attrs={"class": "form-control", "style": "height:80px mt-2"}
             ),
         }
+
+
+class DirectUploadBirdForm(AddBirdForm):
+    """
+    AddBirdForm posted after the picture went straight to the bucket
+    (settings.DIRECT_UPLOADS): the picture is the staged key in the signed
+    upload field, the file input stays for picking another one.
+    """
+
+    upload = forms.CharField(widget=forms.HiddenInput)
+
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        self.fields["picture"].required = False
+
+    def clean_upload(self):
+        return unsign_upload(self.user, self.cleaned_data["upload"])
+
+
+class MultipleUUIDField(forms.Field):
+    """
+    The ids of the checked boxes sharing a name.
+    """
+
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        uuid_field = forms.UUIDField()
+        return [uuid_field.clean(pk) for pk in value]
+
+
+class ModerationForm(forms.Form):
+    APPROVE = "approve"
+    DELETE = "delete"
+
+    action = forms.ChoiceField(
+        choices=[(APPROVE, "Approve"), (DELETE, "Delete")],
+    )
+    comments = MultipleUUIDField(required=False)
+    replies = MultipleUUIDField(required=False)
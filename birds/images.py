@@ -0,0 +1,133 @@
+import posixpath
+import tempfile
+
+from django.core.files.base import File
+from PIL import Image, ImageOps
+
+# widths (in pixels) every bird picture is rendered at
+RENDITION_WIDTHS = (320, 800, 1600)
+
+# encoded renditions bigger than this are spooled to disk before upload
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+# Bird.orientation (degrees, counterclockwise) -> Pillow transposition
+ORIENTATIONS = {
+    0: None,
+    90: Image.Transpose.ROTATE_90,
+    180: Image.Transpose.ROTATE_180,
+    270: Image.Transpose.ROTATE_270,
+}
+
+# (key stored on the bird, Pillow format name, extra encoder options)
+RENDITION_FORMATS = (
+    ("webp", "WEBP", {"quality": 75, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 75, "optimize": True, "progressive": True}),
+)
+
+
+def rendition_name(bird_pk, width, extension, orientation=0):
+    """
+    Name a single rendition is saved under. The content-addressed storage
+    only keeps its top directory and extension and stores the file under
+    the hash of its content (a rotated picture gets new urls by itself),
+    the rest names the file on other storages.
+    """
+    return posixpath.join(
+        "bird",
+        "renditions",
+        str(bird_pk),
+        f"{width}-r{orientation}.{extension}",
+    )
+
+
+def to_rgb(image):
+    """
+    JPEG cannot hold an alpha channel or a palette, flatten those first.
+    """
+    if image.mode in ("RGB", "L"):
+        return image
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert("RGB")
+
+
+def resize_to_width(image, width):
+    """
+    Scale down keeping the aspect ratio. Pictures narrower than the
+    requested width are never upscaled.
+    """
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    # reducing_gap shrinks big images with the fast integer reduce() first
+    return image.resize(
+        (width, height),
+        Image.Resampling.LANCZOS,
+        reducing_gap=3.0,
+    )
+
+
+def orient(image, orientation=0):
+    """
+    Applies the camera EXIF orientation and then the rotation chosen by
+    the photographer. The stored original is never rewritten.
+    """
+    image = ImageOps.exif_transpose(image)
+    transpose = ORIENTATIONS[orientation % 360]
+    if transpose is not None:
+        image = image.transpose(transpose)
+    return image
+
+
+def build_renditions(image, bird_pk, storage, orientation=0):
+    """
+    Render the image at every width of RENDITION_WIDTHS, in every format of
+    RENDITION_FORMATS, and save them to the storage.
+    Returns the mapping stored on Bird.renditions:
+        {"320": {"webp": "bird/<xx>/<sha256>.webp", "jpeg": ...}, ...}
+
+    Memory stays bounded by the largest rendition rather than the upload:
+    JPEGs are downscaled by the decoder itself (draft), every width is
+    resized from the previous one and the encoded output is spooled to a
+    temporary file that the storage reads in chunks.
+    """
+    largest = max(RENDITION_WIDTHS)
+    # no-op for formats other than JPEG, never goes below the requested size
+    image.draft("RGB", (largest, largest))
+    image = to_rgb(orient(image, orientation))
+    renditions = {}
+    for width in sorted(RENDITION_WIDTHS, reverse=True):
+        image = resize_to_width(image, width)
+        renditions[str(width)] = {}
+        for key, image_format, options in RENDITION_FORMATS:
+            name = rendition_name(bird_pk, width, key, orientation)
+            renditions[str(width)][key] = save_image(
+                image, name, image_format, options, storage
+            )
+    return renditions
+
+
+def save_image(image, name, image_format, options, storage):
+    """
+    Encodes the image into a spooled temporary file and streams it to the
+    storage, returns the name it was stored under.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY) as output:
+        image.save(output, format=image_format, **options)
+        output.seek(0)
+        return storage.save(name, File(output, name=name))
+
+
+def rendition_names(renditions):
+    """
+    Every storage name of a Bird.renditions mapping. On a content-addressed
+    storage a file shared by two widths (pictures narrower than a width are
+    not upscaled) comes twice.
+    """
+    names = []
+    for formats in renditions.values():
+        names.extend(formats.values())
+    return names
@@ -0,0 +1,230 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from birds.models import Bird, Comment, Reply, Seed
+
+AUDIT_USERNAME = "audit-queries"
+
+# PostgreSQL: "Seq Scan on birds_bird", SQLite: "SCAN birds_bird" (a SCAN
+# ... USING INDEX walks an index in order, it is not reported)
+SEQ_SCAN = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    "sqlite": re.compile(r"^SCAN (\w+)$"),
+}
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper callback keeping the SELECTs run by a view,
+    with their parameters, so they can be explained afterwards.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            if (sql, params) not in self.queries:
+                self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Requests the main pages and reports the queries whose EXPLAIN plan "
+        "scans a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--birds",
+            type=int,
+            default=2000,
+            help="Synthetic birds (with comments, replies and seeds) created "
+            "for the audit and rolled back afterwards, 0 uses the data as is.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Exit with an error when a sequential scan is found.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        connection = connections[options["database"]]
+        if connection.vendor not in SEQ_SCAN:
+            raise CommandError(f"No EXPLAIN support for {connection.vendor}.")
+
+        with transaction.atomic(using=connection.alias):
+            if options["birds"]:
+                self.seed(options["birds"])
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+            bird = Bird.objects.order_by("-created").first()
+            if bird is None:
+                raise CommandError("There are no birds to audit, use --birds.")
+            pages = self.record_pages(connection, bird)
+            scans = self.report(connection, pages)
+            transaction.set_rollback(True, using=connection.alias)
+
+        if scans and options["fail"]:
+            raise CommandError(f"{scans} queries scan a whole table.")
+
+    def seed(self, birds):
+        """
+        bulk_create'd birds (no image processing) owned by a few users, each
+        with an approved and a pending comment, a reply and three seeds.
+        """
+        User = get_user_model()
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            User(
+                username=f"{AUDIT_USERNAME}-{number}",
+                email=f"{AUDIT_USERNAME}-{number}@example.com",
+                password=password,
+            )
+            for number in range(10)
+        )
+        new_birds = Bird.objects.bulk_create(
+            Bird(
+                species=f"Audit species {number}",
+                location=f"Audit location {number % 50}",
+                picture="default/default_profile_pic.jpg",
+                photographer=users[number % len(users)],
+                photographer_comment="audit",
+                picture_status=Bird.PictureStatus.READY,
+                seed_count=3,
+                approved_comment_count=1,
+            )
+            for number in range(birds)
+        )
+        comments = Comment.objects.bulk_create(
+            Comment(
+                bird=bird,
+                comment="audit",
+                comment_approved=approved,
+                comment_creator=users[(number + 1) % len(users)],
+            )
+            for number, bird in enumerate(new_birds)
+            for approved in (True, False)
+        )
+        Reply.objects.bulk_create(
+            Reply(
+                comment=comment,
+                reply="audit",
+                reply_approved=True,
+                reply_creator=comment.bird.photographer,
+            )
+            for comment in comments
+        )
+        Seed.objects.bulk_create(
+            Seed(
+                seeder=users[(number + offset) % len(users)],
+                bird=bird,
+                seeded=True,
+            )
+            for number, bird in enumerate(new_birds)
+            for offset in (1, 2, 3)
+        )
+
+    def record_pages(self, connection, bird):
+        """
+        Requests every page as the photographer of the latest bird and
+        returns [(page, [(sql, params), ...])].
+        """
+        client = Client()
+        client.force_login(bird.photographer)
+        feed = reverse("birds_nest")
+        search = reverse("search_results")
+        urls = [
+            ("home", reverse("home")),
+            ("birds_nest", feed),
+            ("bird_detail", reverse("bird_detail", kwargs={"pk": bird.pk})),
+            ("profile_detail", bird.photographer.get_absolute_url()),
+            ("search", f"{search}?q={bird.species.split()[0]}"),
+        ]
+        for order_by in ("comment", "seed", "species", "photographer"):
+            ordered = f"{search}?order_by={order_by}"
+            urls.append((f"search by {order_by}", ordered))
+
+        pages = []
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for name, url in urls:
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    response = client.get(url)
+                status = response.status_code
+                if status != 200:
+                    raise CommandError(f"{url} answered {status}.")
+                pages.append((f"{name} ({url})", recorder.queries))
+                # the second page of the cursor paginated views
+                cursor = response.context and response.context.get("page_obj")
+                if cursor is not None and cursor.has_next():
+                    recorder = QueryRecorder()
+                    separator = "&" if "?" in url else "?"
+                    next_url = f"{url}{separator}cursor={cursor.next_cursor}"
+                    with connection.execute_wrapper(recorder):
+                        client.get(next_url)
+                    pages.append((f"{name}, next page", recorder.queries))
+        return pages
+
+    def explain(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            prefix = connection.ops.explain_query_prefix()
+            cursor.execute(f"{prefix} {sql}", params)
+            rows = cursor.fetchall()
+        if connection.vendor == "sqlite":
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+    def report(self, connection, pages):
+        pattern = SEQ_SCAN[connection.vendor]
+        if connection.vendor == "postgresql":
+            # tiny tables are always scanned, with seqscan discouraged a
+            # Seq Scan in the plan means no index can answer the query
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        scans = total = 0
+        for page, queries in pages:
+            self.stdout.write(self.style.MIGRATE_HEADING(page))
+            for sql, params in queries:
+                total += 1
+                plan = self.explain(connection, sql, params)
+                tables = sorted(
+                    {
+                        match[1]
+                        for line in plan
+                        for match in [pattern.search(line)]
+                        if match
+                    }
+                )
+                if self.verbosity >= 2:
+                    self.stdout.write(f"  {sql}")
+                    for line in plan:
+                        self.stdout.write(f"    {line}")
+                if tables:
+                    scans += 1
+                    scanned = ", ".join(tables)
+                    self.stdout.write(
+                        self.style.WARNING(f"  sequential scan of {scanned}")
+                    )
+                    if self.verbosity < 2:
+                        self.stdout.write(f"    {sql[:300]}")
+            if not queries:
+                self.stdout.write("  no queries")
+
+        style = self.style.WARNING if scans else self.style.SUCCESS
+        message = f"{scans} of {total} queries scan a whole table."
+        self.stdout.write(style(message))
+        return scans
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from PIL import Image, UnidentifiedImageError
+
+from birds.cache import bump_bird_versions, touch_feed
+from birds.images import build_renditions, rendition_names
+from birds.models import Bird, StoredFile
+
+
+class Command(BaseCommand):
+    help = "Builds the thumbnail/medium/full renditions of existing birds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Rebuild renditions even for birds that already have them.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        birds = Bird.objects.only("id", "picture", "renditions", "orientation")
+        if not options["force"]:
+            birds = birds.filter(renditions={})
+
+        done = failed = 0
+        for bird in birds.iterator(chunk_size=options["batch_size"]):
+            try:
+                with bird.picture.open("rb") as picture:
+                    renditions = build_renditions(
+                        Image.open(picture),
+                        bird.pk,
+                        bird.picture.storage,
+                        bird.orientation,
+                    )
+            except (FileNotFoundError, UnidentifiedImageError) as error:
+                failed += 1
+                self.stderr.write(f"{bird.pk}: {error}")
+                continue
+            with transaction.atomic():
+                StoredFile.objects.replace(
+                    rendition_names(bird.renditions),
+                    rendition_names(renditions),
+                    bird.picture.storage,
+                )
+                # update() so the picture is not processed again by Bird.save()
+                Bird.objects.filter(pk=bird.pk).update(
+                    renditions=renditions,
+                    picture_status=Bird.PictureStatus.READY,
+                )
+            bump_bird_versions(bird.pk)
+            touch_feed()
+            done += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Renditions built for {done} birds, {failed} failed.",
+            )
+        )
@@ -0,0 +1,109 @@
+from collections import Counter
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from birds.cache import bump_bird_versions, touch_feed
+from birds.images import rendition_names
+from birds.models import Bird, StoredFile
+from whistly.content_storage import ContentAddressedStorageMixin
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the pictures and renditions of the existing birds to the "
+        "content-addressed media storage: every distinct file is stored once, "
+        "the birds are pointed at it, the duplicates are deleted and the "
+        "reference counts (StoredFile) are rebuilt. Run it while no pictures "
+        "are being uploaded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only hash the files and report what would be saved.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        if not isinstance(storage, ContentAddressedStorageMixin):
+            raise CommandError(
+                "The default storage is not content-addressed, see "
+                "STORAGES/MEDIA_STORAGE in the settings."
+            )
+        dry_run = options["dry_run"]
+        # media/test_birds (shared by generate_load_data) and other files
+        # outside the upload directory are left as they are
+        upload_to = Bird._meta.get_field("picture").upload_to.rstrip("/") + "/"
+
+        moved = {}  # old name -> hashed name
+        old_sizes, new_sizes = {}, {}
+        missing = 0
+
+        def hashed(name):
+            nonlocal missing
+            if not name.startswith(upload_to) or storage.is_hashed_name(name):
+                return name
+            if name not in moved:
+                try:
+                    with storage.open(name, "rb") as content:
+                        if dry_run:
+                            moved[name] = storage.hashed_name(name, content)
+                        else:
+                            moved[name] = storage.save(name, content)
+                        old_sizes[name] = new_sizes[moved[name]] = content.size
+                except FileNotFoundError:
+                    missing += 1
+                    self.stderr.write(f"Missing file: {name}")
+                    moved[name] = name
+            return moved[name]
+
+        changed = []
+        birds = Bird.objects.only("id", "picture", "renditions")
+        for bird in birds.iterator(chunk_size=options["batch_size"]):
+            picture = hashed(bird.picture.name)
+            renditions = {
+                width: {key: hashed(name) for key, name in formats.items()}
+                for width, formats in bird.renditions.items()
+            }
+            if picture != bird.picture.name or renditions != bird.renditions:
+                changed.append(bird.pk)
+                if not dry_run:
+                    Bird.objects.filter(pk=bird.pk).update(
+                        picture=picture, renditions=renditions
+                    )
+
+        if not dry_run:
+            self.recount(upload_to)
+            for name in old_sizes:
+                storage.delete(name)
+            bump_bird_versions(*changed)
+            touch_feed()
+
+        saved = sum(old_sizes.values()) - sum(new_sizes.values())
+        moved = "Would move" if dry_run else "Moved"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{moved} {len(changed)} birds: "
+                f"{len(old_sizes)} files to {len(new_sizes)} distinct files, "
+                f"{saved / 1024 / 1024:.1f} MB saved ({missing} missing)."
+            )
+        )
+
+    def recount(self, upload_to):
+        """
+        Rebuilds the reference counts from the birds.
+        """
+        references = Counter()
+        for bird in Bird.objects.only("picture", "renditions").iterator():
+            names = [bird.picture.name, *rendition_names(bird.renditions)]
+            references.update(n for n in names if n.startswith(upload_to))
+        with transaction.atomic():
+            StoredFile.objects.all().delete()
+            StoredFile.objects.bulk_create(
+                StoredFile(name=name, references=count)
+                for name, count in references.items()
+            )
@@ -0,0 +1,316 @@
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from multiprocessing import get_context
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from faker import Faker
+from PIL import Image
+
+from birds.cache import touch_feed
+from birds.images import build_renditions, rendition_names
+from birds.models import (
+    Bird,
+    Comment,
+    PendingModeration,
+    Reply,
+    Seed,
+    StoredFile,
+)
+
+# the pictures shipped for development, rendered once and shared by every
+# generated bird
+TEST_BIRDS_DIR = "test_birds"
+
+# filled in the parent before the pool forks, read by the workers
+STATE = {}
+
+
+def geometric(rng, mean, limit):
+    """
+    A count with the given mean and a long tail (most birds get a few
+    comments or seeds, a handful get a lot).
+    """
+    if mean <= 0:
+        return 0
+    return min(int(rng.expovariate(1 / mean)), limit)
+
+
+def create_users(task):
+    first, count = task
+    password = STATE["password"]
+    run = STATE["run"]
+    users = [
+        get_user_model()(
+            username=f"load-{run}-{index}",
+            email=f"load-{run}-{index}@example.com",
+            password=password,
+        )
+        for index in range(first, first + count)
+    ]
+    with transaction.atomic(using=STATE["database"]):
+        get_user_model().objects.using(STATE["database"]).bulk_create(
+            users, batch_size=STATE["batch_size"]
+        )
+    return len(users)
+
+
+def create_birds(task):
+    """
+    One batch of birds with their comments, replies and seeds, in a single
+    transaction. Photographers follow a power law (a few users post most of
+    the birds), the counters are set on the birds as they are built.
+    """
+    number, count = task
+    rng = random.Random(f"{STATE['seed']}-{number}")
+    fake = Faker()
+    fake.seed_instance(f"{STATE['seed']}-{number}")
+    user_ids = STATE["user_ids"]
+    pictures = STATE["pictures"]
+    options = STATE["options"]
+
+    birds, comments, replies, seeds, pending = [], [], [], [], []
+    for _ in range(count):
+        photographer = rng.choices(user_ids, cum_weights=STATE["weights"])[0]
+        picture, renditions = rng.choice(pictures)
+        bird = Bird(
+            id=uuid.uuid4(),
+            species=fake.last_name(),
+            location=fake.country(),
+            photographer_id=photographer,
+            photographer_comment=fake.paragraph(),
+            picture=picture,
+            renditions=renditions,
+            picture_status=Bird.PictureStatus.READY,
+        )
+        for commenter in rng.choices(
+            user_ids, k=geometric(rng, options["comments"], 200)
+        ):
+            approved = commenter == photographer or rng.random() < 0.8
+            comment = Comment(
+                id=uuid.uuid4(),
+                bird=bird,
+                comment=fake.sentence(),
+                comment_approved=approved,
+                comment_creator_id=commenter,
+            )
+            comments.append(comment)
+            bird.approved_comment_count += approved
+            if not approved:
+                pending.append(
+                    PendingModeration(
+                        photographer_id=photographer,
+                        bird=bird,
+                        comment=comment,
+                        creator_id=commenter,
+                    )
+                )
+            if approved and rng.random() < options["replies"]:
+                candidates = (photographer, commenter, rng.choice(user_ids))
+                replier = rng.choice(candidates)
+                reply = Reply(
+                    id=uuid.uuid4(),
+                    comment=comment,
+                    reply=fake.sentence(),
+                    reply_approved=replier in (photographer, commenter)
+                    or rng.random() < 0.8,
+                    reply_creator_id=replier,
+                )
+                replies.append(reply)
+                if not reply.reply_approved:
+                    pending.append(
+                        PendingModeration(
+                            photographer_id=photographer,
+                            bird=bird,
+                            reply=reply,
+                            creator_id=replier,
+                        )
+                    )
+        k = geometric(rng, options["seeds"], len(user_ids))
+        seeders = rng.sample(user_ids, k)
+        for user in seeders:
+            seeds.append(Seed(seeder_id=user, bird=bird, seeded=True))
+        bird.seed_count = len(seeders)
+        birds.append(bird)
+
+    database = STATE["database"]
+    batch_size = STATE["batch_size"]
+    with transaction.atomic(using=database):
+        Bird.objects.using(database).bulk_create(birds, batch_size=batch_size)
+        Comment.objects.using(database).bulk_create(
+            comments,
+            batch_size=batch_size,
+        )
+        Reply.objects.using(database).bulk_create(
+            replies,
+            batch_size=batch_size,
+        )
+        Seed.objects.using(database).bulk_create(seeds, batch_size=batch_size)
+        # the inbox counters are set once all the batches are in
+        PendingModeration.objects.using(database).bulk_create(
+            pending, batch_size=batch_size
+        )
+        # the shared renditions are deleted with the last bird using them
+        StoredFile.objects.db_manager(database).retain(
+            name for bird in birds for name in rendition_names(bird.renditions)
+        )
+    return sum(map(len, (birds, comments, replies, seeds, pending)))
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates users, birds, comments, replies and seeds for load "
+        "tests with bulk inserts. The pictures of media/test_birds are "
+        "rendered once and shared by all the birds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--birds", type=int, default=1000)
+        parser.add_argument(
+            "--comments",
+            type=float,
+            default=3,
+            help="Mean number of comments per bird.",
+        )
+        parser.add_argument(
+            "--replies",
+            type=float,
+            default=0.3,
+            help="Share of the approved comments that get a reply.",
+        )
+        parser.add_argument(
+            "--seeds",
+            type=float,
+            default=5,
+            help="Mean number of seeds per bird.",
+        )
+        parser.add_argument(
+            "--password",
+            default="load-test",
+            help="Password of every generated user, hashed once.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            help="Worker processes, the number of CPUs by default (1 on "
+            "SQLite, that allows a single writer).",
+        )
+        parser.add_argument(
+            "--seed", default="whistly", help="Seed of the random generators."
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        processes = options["processes"]
+        if processes is None:
+            processes = 1 if connection.vendor == "sqlite" else os.cpu_count()
+        if options["birds"] and not options["users"]:
+            raise CommandError("Birds need photographers, use --users.")
+
+        STATE.update(
+            database=options["database"],
+            batch_size=options["batch_size"],
+            seed=options["seed"],
+            options=options,
+            password=make_password(options["password"]),
+            run=uuid.uuid4().hex[:8],
+            pictures=self.render_pictures(),
+        )
+
+        start = time.perf_counter()
+        users = self.run_tasks(
+            create_users,
+            [
+                (first, min(options["batch_size"], options["users"] - first))
+                for first in range(0, options["users"], options["batch_size"])
+            ],
+            processes,
+        )
+        self.report("users", users, start)
+
+        user_ids = list(
+            get_user_model()
+            .objects.using(options["database"])
+            .filter(username__startswith=f"load-{STATE['run']}-")
+            .values_list("pk", flat=True)
+        )
+        rng = random.Random(options["seed"])
+        rng.shuffle(user_ids)
+        ranks = range(1, len(user_ids) + 1)
+        STATE.update(
+            user_ids=user_ids,
+            # Zipf-like: the user of rank r posts in proportion to 1/r
+            weights=list(accumulate(1 / rank for rank in ranks)),
+        )
+
+        start = time.perf_counter()
+        rows = self.run_tasks(
+            create_birds,
+            [
+                (number, min(options["batch_size"], options["birds"] - first))
+                for number, first in enumerate(
+                    range(0, options["birds"], options["batch_size"])
+                )
+            ],
+            processes,
+        )
+        self.report(
+            "birds with their comments, replies and seeds "
+            f"({options['birds']} birds)",
+            rows,
+            start,
+        )
+        PendingModeration.objects.db_manager(options["database"]).recount(
+            get_user_model()
+            .objects.using(options["database"])
+            .filter(username__startswith=f"load-{STATE['run']}-")
+            .values("pk")
+        )
+        touch_feed()
+
+    def render_pictures(self):
+        """
+        [(picture name, renditions)] of media/test_birds, the renditions are
+        built once per picture and shared by its birds (the storage keeps
+        the files of a previous run, content-addressed).
+        """
+        directories, files = default_storage.listdir(TEST_BIRDS_DIR)
+        if not files:
+            raise CommandError(f"No pictures found in media/{TEST_BIRDS_DIR}.")
+        pictures = []
+        for filename in sorted(files):
+            name = f"{TEST_BIRDS_DIR}/{filename}"
+            key = f"load-data-{os.path.splitext(filename)[0]}"
+            with default_storage.open(name, "rb") as picture:
+                image = Image.open(picture)
+                renditions = build_renditions(image, key, default_storage)
+            pictures.append((name, renditions))
+        return pictures
+
+    def run_tasks(self, function, tasks, processes):
+        if processes <= 1 or len(tasks) <= 1:
+            return sum(function(task) for task in tasks)
+        # every worker opens its own connections, none is shared over fork
+        connections.close_all()
+        context = get_context("fork")
+        with ProcessPoolExecutor(processes, mp_context=context) as pool:
+            return sum(pool.map(function, tasks))
+
+    def report(self, label, rows, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{rows} rows of {label} in {elapsed:.1f}s "
+                f"({rows / max(elapsed, 1e-9):.0f} rows/s)"
+            )
+        )
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from birds.models import Bird, PendingModeration
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the seed and approved comment counters of every bird, "
+        "rebuilds the moderation inboxes from the comments and replies "
+        "waiting for approval and recounts them."
+    )
+
+    def handle(self, *args, **options):
+        drifted = (
+            Bird.objects.with_real_counts()
+            .exclude(
+                seed_count=F("real_seed_count"),
+                approved_comment_count=F("real_approved_comment_count"),
+            )
+            .count()
+        )
+        updated = Bird.objects.recount()
+        with transaction.atomic():
+            removed, added = PendingModeration.objects.rebuild()
+            users = get_user_model().objects.values("pk")
+            PendingModeration.objects.recount(users)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Recounted {updated} birds, {drifted} had drifted. "
+                f"Inboxes: {removed} approved items removed, {added} added."
+            )
+        )
@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def work(poll_interval):
+    """
+    Worker process loop: claims and runs jobs until it gets SIGTERM,
+    sleeping poll_interval seconds whenever the queue is empty. The job
+    being processed is always finished before exiting.
+    """
+    stopping = []
+    # ctrl+c is handled by the parent, which forwards a SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    django.setup()
+    from birds.models import ImageJob
+
+    while not stopping:
+        job = ImageJob.objects.claim()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        job.run(claimed=True)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Runs a pool of processes resizing and re-encoding queued pictures."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of worker processes (defaults to the CPU count).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before polling an empty queue again.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the pending jobs in this process and exit.",
+        )
+
+    def handle(self, *args, **options):
+        from birds.models import ImageJob
+
+        requeued = ImageJob.objects.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale jobs.")
+
+        if options["once"]:
+            count = ImageJob.objects.run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} image jobs."))
+            return
+
+        # children open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=work, args=(options["poll_interval"],))
+            for _ in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(
+            f"Image worker running with {len(workers)} processes.",
+        )
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        try:
+            while all(worker.is_alive() for worker in workers):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join(timeout=60)
+                if worker.is_alive():
+                    worker.kill()
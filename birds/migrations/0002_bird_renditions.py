@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bird",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:33
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Mod
+
+# pending rotation jobs queued before rotation became metadata-only
+ROTATIONS = {"rotate_left": 270, "rotate_right": 90}
+
+
+def convert_rotation_jobs(apps, schema_editor):
+    """
+    Each pending job was one turn of its bird: the turns are added up per
+    bird and a single render job is kept for it.
+    """
+    Bird = apps.get_model("birds", "Bird")
+    ImageJob = apps.get_model("birds", "ImageJob")
+    jobs = ImageJob.objects.filter(kind__in=ROTATIONS, status="pending")
+    turns = defaultdict(int)
+    for bird_id, kind in jobs.values_list("bird_id", "kind"):
+        turns[bird_id] = (turns[bird_id] + ROTATIONS[kind]) % 360
+    by_degrees = defaultdict(list)
+    for bird_id, degrees in turns.items():
+        by_degrees[degrees].append(bird_id)
+    for degrees, bird_ids in by_degrees.items():
+        if degrees:
+            Bird.objects.filter(pk__in=bird_ids).update(
+                orientation=Mod(F("orientation") + degrees, 360)
+            )
+    jobs.update(kind="render")
+    pending = ImageJob.objects.filter(
+        bird_id__in=list(turns),
+        status="pending",
+    )
+    kept = {}
+    oldest_first = pending.order_by("created")
+    for job_id, bird_id in oldest_first.values_list("pk", "bird_id"):
+        kept.setdefault(bird_id, job_id)
+    pending.exclude(pk__in=kept.values()).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0003_image_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bird",
+            name="orientation",
+            field=models.PositiveSmallIntegerField(
+                choices=[(0, "0°"), (90, "90°"), (180, "180°"), (270, "270°")],
+                default=0,
+                editable=False,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="imagejob",
+            name="kind",
+            field=models.CharField(
+                choices=[("render", "Render")], default="render", max_length=20
+            ),
+        ),
+        migrations.RunPython(convert_rotation_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset):
+    counts = queryset.order_by().values("bird").annotate(count=Count("pk"))
+    return Coalesce(Subquery(counts.values("count")), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Bird = apps.get_model("birds", "Bird")
+    Comment = apps.get_model("birds", "Comment")
+    Seed = apps.get_model("birds", "Seed")
+    Bird.objects.update(
+        seed_count=count_subquery(Seed.objects.filter(bird=OuterRef("pk"))),
+        approved_comment_count=count_subquery(
+            Comment.objects.filter(bird=OuterRef("pk"), comment_approved=True)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0004_bird_orientation"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="bird",
+            name="approved_comment_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="bird",
+            name="seed_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["-seed_count", "-created"], name="bird_seed_count_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["-approved_comment_count", "-created"],
+                name="bird_comment_count_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:52
+
+import django.contrib.postgres.search
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, migrations
+
+# The text search objects only exist on PostgreSQL, other databases keep
+# an empty search_vector column and BirdQuerySet.search falls back to
+# icontains there.
+SEARCH_SQL = """
+CREATE FUNCTION birds_bird_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.species, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(NEW.location, '')), 'B')
+        || setweight(
+            to_tsvector('english', coalesce(NEW.photographer_comment, '')), 'C'
+        );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER birds_bird_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF species, location, photographer_comment
+    ON birds_bird
+    FOR EACH ROW EXECUTE FUNCTION birds_bird_search_vector_update();
+
+UPDATE birds_bird SET species = species;
+
+CREATE INDEX bird_search_vector_idx ON birds_bird USING gin (search_vector);
+CREATE INDEX bird_species_trgm_idx ON birds_bird
+    USING gin (species gin_trgm_ops);
+CREATE INDEX bird_location_trgm_idx ON birds_bird
+    USING gin (location gin_trgm_ops);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS bird_location_trgm_idx;
+DROP INDEX IF EXISTS bird_species_trgm_idx;
+DROP INDEX IF EXISTS bird_search_vector_idx;
+DROP TRIGGER IF EXISTS birds_bird_search_vector_trigger ON birds_bird;
+DROP FUNCTION IF EXISTS birds_bird_search_vector_update();
+"""
+
+
+# The search (BirdQuerySet.search) and the indexes of this migration and of
+# users 0003 need pg_trgm. It ships with PostgreSQL's contrib package and is
+# a trusted extension (PostgreSQL 13+): the owner of the database can create
+# it, no superuser needed.
+TRIGRAM_MISSING = (
+    "The pg_trgm extension could not be created ({reason}). Install the "
+    "PostgreSQL contrib package on the database server (postgresql-contrib), "
+    "or have a superuser run CREATE EXTENSION pg_trgm; in this database if "
+    "the migrating user may not, then migrate again."
+)
+
+
+def create_trigram_extension(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT installed_version FROM pg_available_extensions "
+            "WHERE name = 'pg_trgm'"
+        )
+        available = cursor.fetchone()
+    if available is None:
+        raise ImproperlyConfigured(
+            TRIGRAM_MISSING.format(reason="not available on the server")
+        )
+    if available[0] is None:
+        try:
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError as error:
+            raise ImproperlyConfigured(
+                TRIGRAM_MISSING.format(reason=str(error).strip())
+            ) from error
+
+
+def drop_trigram_extension(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP EXTENSION IF EXISTS pg_trgm")
+
+
+def create_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SEARCH_SQL)
+
+
+def drop_search_objects(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0005_bird_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_extension, drop_trigram_extension),
+        migrations.AddField(
+            model_name="bird",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0006_bird_search_vector"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="bird",
+            name="bird_seed_count_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="bird",
+            name="bird_comment_count_idx",
+        ),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["-created", "-id"],
+                name="bird_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["-seed_count", "-created", "-id"],
+                name="bird_seed_count_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["-approved_comment_count", "-created", "-id"],
+                name="bird_comment_count_idx",
+            ),
+        ),
+    ]
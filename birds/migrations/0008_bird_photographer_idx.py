@@ -0,0 +1,22 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0007_bird_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["photographer", "-created", "-id"],
+                name="bird_photographer_idx",
+            ),
+        ),
+    ]
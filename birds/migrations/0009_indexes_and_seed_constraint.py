@@ -0,0 +1,96 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_seeds(apps, schema_editor):
+    """
+    Keeps one seed per (seeder, bird) so the unique constraint can be added,
+    and recounts Bird.seed_count of the birds that had duplicates.
+    """
+    Bird = apps.get_model("birds", "Bird")
+    Seed = apps.get_model("birds", "Seed")
+    duplicates = (
+        Seed.objects.values("seeder", "bird")
+        .annotate(seeds=Count("pk"))
+        .filter(seeds__gt=1)
+        .order_by()
+    )
+    bird_ids = set()
+    for duplicate in duplicates:
+        seeds = Seed.objects.filter(
+            seeder=duplicate["seeder"], bird=duplicate["bird"]
+        ).values_list("pk", flat=True)
+        Seed.objects.filter(pk__in=list(seeds)[1:]).delete()
+        bird_ids.add(duplicate["bird"])
+    if bird_ids:
+        counts = (
+            Seed.objects.filter(bird=OuterRef("pk"))
+            .order_by()
+            .values("bird")
+            .annotate(count=Count("pk"))
+        )
+        Bird.objects.filter(pk__in=bird_ids).update(
+            seed_count=Coalesce(Subquery(counts.values("count")), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0008_bird_photographer_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(
+                fields=["species", "id"],
+                name="bird_species_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["bird", "comment_approved", "-created"],
+                name="comment_bird_approved_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                condition=models.Q(("comment_approved", False)),
+                fields=["bird", "-created"],
+                name="comment_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reply",
+            index=models.Index(
+                fields=["comment", "reply_approved", "created"],
+                name="reply_comment_approved_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reply",
+            index=models.Index(
+                condition=models.Q(("reply_approved", False)),
+                fields=["comment", "created"],
+                name="reply_pending_idx",
+            ),
+        ),
+        migrations.RunPython(
+            remove_duplicate_seeds,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name="seed",
+            constraint=models.UniqueConstraint(
+                fields=("seeder", "bird"), name="seed_unique_seeder_bird"
+            ),
+        ),
+    ]
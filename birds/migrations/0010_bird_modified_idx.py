@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0009_indexes_and_seed_constraint"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bird",
+            index=models.Index(fields=["-modified"], name="bird_modified_idx"),
+        ),
+    ]
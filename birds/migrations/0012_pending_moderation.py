@@ -0,0 +1,163 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:50
+
+import uuid
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_inboxes(apps, schema_editor):
+    Comment = apps.get_model("birds", "Comment")
+    Reply = apps.get_model("birds", "Reply")
+    PendingModeration = apps.get_model("birds", "PendingModeration")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    comments = Comment.objects.filter(comment_approved=False).values_list(
+        "pk",
+        "bird_id",
+        "bird__photographer_id",
+        "comment_creator_id",
+        "created",
+    )
+    PendingModeration.objects.bulk_create(
+        (
+            PendingModeration(
+                comment_id=pk,
+                bird_id=bird,
+                photographer_id=photographer,
+                creator_id=creator,
+                created=created,
+            )
+            for pk, bird, photographer, creator, created in comments.iterator()
+        ),
+        batch_size=1000,
+    )
+    replies = Reply.objects.filter(reply_approved=False).values_list(
+        "pk",
+        "comment__bird_id",
+        "comment__bird__photographer_id",
+        "reply_creator_id",
+        "created",
+    )
+    PendingModeration.objects.bulk_create(
+        (
+            PendingModeration(
+                reply_id=pk,
+                bird_id=bird,
+                photographer_id=photographer,
+                creator_id=creator,
+                created=created,
+            )
+            for pk, bird, photographer, creator, created in replies.iterator()
+        ),
+        batch_size=1000,
+    )
+    pending = (
+        PendingModeration.objects.filter(photographer=OuterRef("pk"))
+        .order_by()
+        .values("photographer")
+        .annotate(count=Count("pk"))
+    )
+    User.objects.update(
+        pending_moderation_count=Coalesce(Subquery(pending.values("count")), 0)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("birds", "0011_stored_files"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("users", "0004_customuser_pending_moderation_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PendingModeration",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "bird",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="birds.bird",
+                    ),
+                ),
+                (
+                    "comment",
+                    models.OneToOneField(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="birds.comment",
+                    ),
+                ),
+                (
+                    "creator",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "photographer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "reply",
+                    models.OneToOneField(
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="birds.reply",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["photographer", "created"],
+                        name="pending_photographer_idx",
+                    )
+                ],
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("comment__isnull", False),
+                                ("reply__isnull", True),
+                            ),
+                            models.Q(
+                                ("comment__isnull", True),
+                                ("reply__isnull", False),
+                            ),
+                            _connector="OR",
+                        ),
+                        name="pending_comment_or_reply",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(fill_inboxes, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,48 @@
 import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
 
-# to save the newly resized image into memory before saving
-from io import BytesIO
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
-
-# to manage uploaded files while still in memory (before saving)
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db import models
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import (
+    Count,
+    F,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    prefetch_related_objects,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, Mod
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from PIL import Image
 
+from whistly import metrics
+
+from .cache import bump_bird_versions, touch_feed
+from .images import RENDITION_WIDTHS, build_renditions, rendition_names
+from .uploads import ingest_upload, is_staged
 from .utils import file_size
 
 # Create your models here.
 
+# text search configuration of Bird.search_vector, must match the trigger
+# created in migration 0006_bird_search_vector
+SEARCH_CONFIG = "english"
+
+# pending comments (and replies) shown on a bird page
+PENDING_ON_PAGE = 20
+
 
 class TimeStampedModel(models.Model):
     """
@@ -29,7 +57,149 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+def count_subquery(queryset):
+    """
+    Number of rows of a queryset filtered on bird=OuterRef("pk"), usable in
+    annotate() and update().
+    """
+    counts = queryset.order_by().values("bird").annotate(count=Count("pk"))
+    return Coalesce(Subquery(counts.values("count")), 0)
+
+
+def group_by_count(counts):
+    """
+    [(count, keys)] of a {key: count} mapping, to apply a counter change to
+    all the keys sharing a count with one UPDATE.
+    """
+    groups = defaultdict(list)
+    for key, count in counts.items():
+        groups[count].append(key)
+    return groups.items()
+
+
+class BirdQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        Birds matching a search term, best matches first.
+        On PostgreSQL the GIN indexed search_vector (species, location and
+        photographer comment, kept up to date by a trigger) is matched and
+        ranked, trigram similarity catches misspelled species/locations.
+        Other databases fall back to icontains.
+        Photographers are resolved first so the OR stays on the birds table.
+        """
+        photographers = get_user_model().objects.filter(
+            username__icontains=query,
+        )
+        by_photographer = Q(photographer__in=photographers.values("pk"))
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(
+                by_photographer
+                | Q(species__icontains=query)
+                | Q(photographer_comment__icontains=query)
+                | Q(location__icontains=query)
+            )
+
+        search_query = SearchQuery(
+            query,
+            config=SEARCH_CONFIG,
+            search_type="websearch",
+        )
+        return (
+            self.filter(
+                by_photographer
+                | Q(search_vector=search_query)
+                | Q(species__trigram_similar=query)
+                | Q(location__trigram_similar=query)
+            )
+            .annotate(
+                # double precision: a real would not survive the round trip
+                # through a pagination cursor exactly
+                rank=Cast(
+                    SearchRank(F("search_vector"), search_query)
+                    + Greatest(
+                        TrigramSimilarity("species", query),
+                        TrigramSimilarity("location", query),
+                    ),
+                    models.FloatField(),
+                )
+            )
+            .order_by("-rank", "-created")
+        )
+
+    def search_results(self, query=None, order_by=None):
+        """
+        The birds of the search page (and of the JSON API): ?q= and
+        ?order_by= as they come from the query string.
+        """
+        # if search term is entered it will update the queryset from all to specific  # noqa: E501
+        # (full-text search ranked by relevance, see search())
+        queryset = self
+        if query:
+            queryset = queryset.search(query)
+        # if order_by link is clicked it will order queryset accordingly
+        # using the indexed denormalized counters (no COUNT over joins)
+        if order_by:
+            if "comment" in order_by:
+                ordering = ("-approved_comment_count", "-created")
+                queryset = queryset.filter(approved_comment_count__gt=0)
+                queryset = queryset.order_by(*ordering)
+            elif "seed" in order_by:
+                queryset = queryset.order_by("-seed_count", "-created")
+            elif "species" in order_by:
+                queryset = queryset.order_by("species")
+            elif "photographer" in order_by:
+                queryset = queryset.order_by("photographer__username")
+        return queryset
+
+    def adjust_counters(self, seeds=0, approved_comments=0):
+        """
+        Atomic (F()) update of the denormalized counters, no read needed.
+        """
+        comments = F("approved_comment_count") + approved_comments
+        return self.update(
+            seed_count=F("seed_count") + seeds,
+            approved_comment_count=comments,
+        )
+
+    def with_real_counts(self):
+        """
+        Annotates the counters computed from the seed/comment tables.
+        """
+        return self.annotate(
+            real_seed_count=count_subquery(
+                Seed.objects.filter(bird=OuterRef("pk")),
+            ),
+            real_approved_comment_count=count_subquery(
+                Comment.objects.filter(
+                    bird=OuterRef("pk"),
+                    comment_approved=True,
+                )
+            ),
+        )
+
+    def recount(self):
+        """
+        Recomputes the denormalized counters from the seed/comment tables.
+        """
+        return self.update(
+            seed_count=count_subquery(
+                Seed.objects.filter(bird=OuterRef("pk")),
+            ),
+            approved_comment_count=count_subquery(
+                Comment.objects.filter(
+                    bird=OuterRef("pk"),
+                    comment_approved=True,
+                )
+            ),
+        )
+
+
 class Bird(TimeStampedModel):
+    class PictureStatus(models.TextChoices):
+        PROCESSING = "processing"
+        READY = "ready"
+        FAILED = "failed"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     species = models.CharField(max_length=150, blank=False)
     location = models.CharField(max_length=200, blank=False)
@@ -42,9 +212,55 @@ class Bird(TimeStampedModel):
         related_name="photographers",
     )
     photographer_comment = models.TextField(max_length=500)
+    # {"<width>": {"webp": "<storage name>", "jpeg": "<storage name>"}}
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # rotation chosen by the photographer, in degrees counterclockwise,
+    # applied when the renditions are built
+    orientation = models.PositiveSmallIntegerField(
+        choices=[(degrees, f"{degrees}°") for degrees in (0, 90, 180, 270)],
+        default=0,
+        editable=False,
+    )
+    picture_status = models.CharField(
+        max_length=10,
+        choices=PictureStatus.choices,
+        default=PictureStatus.READY,
+        editable=False,
+    )
+    # denormalized counters, kept up to date by the views with F() updates
+    # (manage.py recount_birds repairs any drift)
+    seed_count = models.PositiveIntegerField(default=0, editable=False)
+    approved_comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+    # maintained by a database trigger on PostgreSQL, see BirdQuerySet.search
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BirdQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created"]
+        # the cursor pagination keys (birds/pagination.py), id is the
+        # tie-breaker so every page is a single index range scan
+        indexes = [
+            models.Index(fields=["-created", "-id"], name="bird_created_idx"),
+            models.Index(
+                fields=["photographer", "-created", "-id"],
+                name="bird_photographer_idx",
+            ),
+            models.Index(fields=["species", "id"], name="bird_species_idx"),
+            # newest change of the feed, pages/middleware.py
+            models.Index(fields=["-modified"], name="bird_modified_idx"),
+            models.Index(
+                fields=["-seed_count", "-created", "-id"],
+                name="bird_seed_count_idx",
+            ),
+            models.Index(
+                fields=["-approved_comment_count", "-created", "-id"],
+                name="bird_comment_count_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.species
@@ -52,76 +268,244 @@ class Bird(TimeStampedModel):
     def get_absolute_url(self):
         return reverse("bird_detail", kwargs={"pk": self.pk})
 
+    def rendition_url(self, width, key="jpeg"):
+        """
+        Url of a single rendition, falls back to the original picture for
+        birds whose renditions were not built yet.
+        """
+        name = self.renditions.get(str(width), {}).get(key)
+        if not name:
+            return self.picture.url
+        return self.picture.storage.url(name)
+
+    def rendition_srcset(self, key):
+        """
+        Builds the value of a srcset attribute for the given format.
+        """
+        return ", ".join(
+            f"{self.picture.storage.url(formats[key])} {width}w"
+            for width, formats in sorted(
+                self.renditions.items(), key=lambda item: int(item[0])
+            )
+            if key in formats
+        )
+
+    @property
+    def thumbnail_url(self):
+        return self.rendition_url(RENDITION_WIDTHS[0])
+
+    @property
+    def medium_url(self):
+        return self.rendition_url(RENDITION_WIDTHS[1])
+
+    @property
+    def full_url(self):
+        return self.rendition_url(RENDITION_WIDTHS[-1])
+
+    @property
+    def thumbnail_webp_url(self):
+        return self.rendition_url(RENDITION_WIDTHS[0], "webp")
+
+    @property
+    def webp_srcset(self):
+        return self.rendition_srcset("webp")
+
+    @property
+    def jpeg_srcset(self):
+        return self.rendition_srcset("jpeg")
+
+    @cached_property
+    def approved_thread(self):
+        """
+        The approved comments, newest first, with their approved replies in
+        comment.approved_replies and the creators of both, in two queries.
+        Only evaluated when the cached thread fragment of bird_detail.html
+        has to be rendered again.
+        """
+        comments = list(
+            self.comments.filter(comment_approved=True).select_related(
+                "comment_creator"
+            )
+        )
+        prefetch_related_objects(
+            comments,
+            Prefetch(
+                "replies",
+                queryset=Reply.objects.filter(reply_approved=True)
+                .select_related("reply_creator")
+                .order_by("created"),
+                to_attr="approved_replies",
+            ),
+        )
+        return comments
+
+    def pending_querysets(self, user):
+        """
+        The comments and replies waiting for approval the user may see: all
+        of them for the photographer, their own for anyone else.
+        """
+        comments = Comment.objects.filter(bird=self, comment_approved=False)
+        replies = Reply.objects.filter(
+            comment__bird=self,
+            comment__comment_approved=True,
+            reply_approved=False,
+        )
+        if not user.is_authenticated or (
+            # the inbox counter says there is nothing to look for
+            user.pk == self.photographer_id
+            and not user.pending_moderation_count
+        ):
+            comments, replies = comments.none(), replies.none()
+        elif user.pk != self.photographer_id:
+            comments = comments.filter(comment_creator=user)
+            replies = replies.filter(reply_creator=user)
+        # however much spam piles up, the rest waits in the moderation queue
+        return (
+            comments.select_related("comment_creator")[:PENDING_ON_PAGE],
+            replies.select_related(
+                "reply_creator", "comment__comment_creator"
+            ).order_by("created")[:PENDING_ON_PAGE],
+        )
+
+    def load_pending(self, user):
+        """
+        Loads the pending items of the user into pending_comments /
+        pending_replies (two queries). They are per user, so they are
+        rendered outside the cached fragments.
+        """
+        comments, replies = self.pending_querysets(user)
+        self.pending_comments = list(comments)
+        self.pending_replies = list(replies)
+        return self
+
+    async def aload_pending(self, user):
+        comments, replies = self.pending_querysets(user)
+        self.pending_comments = [comment async for comment in comments]
+        self.pending_replies = [reply async for reply in replies]
+        return self
+
+    @property
+    def stored_names(self):
+        """
+        Storage names of the picture and of its renditions.
+        """
+        return [self.picture.name, *rendition_names(self.renditions)]
+
+    @property
+    def is_processing(self):
+        return self.picture_status == self.PictureStatus.PROCESSING
+
     def save(self, *args, **kwargs):
         """
-        Resize image before calling save()
-        Using ByteIO() to encode and save the file into system memory
-        before saving to filesystem.
-        """
-        image = Image.open(self.picture)
-        output = BytesIO()
-        width, height = image.size
-        image = image.resize((int(width / 2), int(height / 2)), Image.Resampling.LANCZOS) # noqa: E501
-        image.save(output, format="JPEG", optimize=True, quality=75)
-        output.seek(0)
-        self.picture = InMemoryUploadedFile(
-            output,
-            "ImageField",
-            self.picture.name,
-            "image/jpeg",
-            output.tell(),
-            None,  # noqa: E501
-        )
-        return super().save(*args, **kwargs)
+        Pictures are not processed on the request anymore, a new upload (or a
+        bird without renditions) is stored as it is and an ImageJob is queued
+        for the image worker (manage.py run_image_worker).
+        Editing species/location leaves the picture untouched, a save with
+        update_fields that leave out the picture (BirdUpdateView) only writes
+        those columns.
+        """
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "picture" not in update_fields:
+            return super().save(*args, **kwargs)
+        new_picture = not self.picture._committed
+        needs_processing = new_picture or (
+            not self.renditions and not self.is_processing
+        )
+        if needs_processing:
+            self.picture_status = self.PictureStatus.PROCESSING
+        replaced = None
+        if new_picture and not self._state.adding:
+            replaced = (
+                Bird.objects.filter(pk=self.pk)
+                .values_list("picture", flat=True)
+                .first()
+            )
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if new_picture:
+                StoredFile.objects.retain([self.picture.name])
+                if replaced:
+                    StoredFile.objects.release(
+                        [replaced],
+                        self.picture.storage,
+                    )
+            if needs_processing:
+                ImageJob.objects.enqueue(self)
 
     def rotate_right(self, *args, **kwards):
         """
         Method to rotate pictures uploaded by users by 90 degrees
         """
-        original = Image.open(self.picture)
-        rotated = BytesIO()
-        original = original.transpose(Image.ROTATE_90)
-        original.save(rotated, format="JPEG")
-        rotated.seek(0)
-        self.picture = InMemoryUploadedFile(
-            rotated,
-            "ImageField",
-            self.picture.name,
-            "image/jpeg",
-            rotated.tell(),
-            None,  # noqa: E501
-        )
-        self.rotate_save()
-
+        self.rotate(90)
         return reverse("bird_detail", kwargs={"pk": self.pk})
 
     def rotate_left(self, *args, **kwards):
         """
         Method to rotate pictures uploaded by users by 270 degrees
         """
-        original = Image.open(self.picture)
-        rotated = BytesIO()
-        original = original.transpose(Image.ROTATE_270)
-        original.save(rotated, format="JPEG")
-        rotated.seek(0)
-        self.picture = InMemoryUploadedFile(
-            rotated,
-            "ImageField",
-            self.picture.name,
-            "image/jpeg",
-            rotated.tell(),
-            None,  # noqa: E501
-        )
-        self.rotate_save()
-        print("this is left")
+        self.rotate(270)
         return reverse("bird_detail", kwargs={"pk": self.pk})
 
-    def rotate_save(self, *args, **kwargs):
+    def rotate(self, degrees):
         """
-        Save rotated image without changing its quality as the
-        custom method save
+        Rotation is only metadata: the orientation is updated in the database
+        and the renditions are rebuilt once by the image worker, the original
+        picture is never decoded/re-encoded (no quality loss per click).
         """
-        return super().save(*args, **kwargs)
+        with transaction.atomic():
+            Bird.objects.filter(pk=self.pk).update(
+                orientation=Mod(F("orientation") + degrees, 360),
+                picture_status=self.PictureStatus.PROCESSING,
+            )
+            ImageJob.objects.enqueue(self)
+            bump_bird_versions(self.pk)
+            touch_feed()
+        self.orientation = (self.orientation + degrees) % 360
+        self.picture_status = self.PictureStatus.PROCESSING
+
+
+class CommentQuerySet(models.QuerySet):
+    def moderated_by(self, user):
+        """
+        The comments the user may approve: those on their own birds.
+        """
+        return self.filter(bird__photographer=user)
+
+    def removable_by(self, user):
+        """
+        The comments the user may delete: their own and those on their own
+        birds.
+        """
+        owner = Q(bird__photographer=user)
+        return self.filter(Q(comment_creator=user) | owner)
+
+    def approve(self):
+        """
+        Approves the pending comments of the queryset with a single
+        UPDATE ... WHERE id IN and counts them on their birds (one UPDATE
+        per distinct increment). Returns the number of comments approved.
+        """
+        with transaction.atomic(using=self.db):
+            # locked so a concurrent approval cannot count them twice (on
+            # model instances, values_list() would drop the OF clause)
+            locked = self.filter(comment_approved=False).select_for_update(
+                of=("self",),
+            )
+            comments = locked.only("bird")
+            pending = {comment.pk: comment.bird_id for comment in comments}
+            if not pending:
+                return 0
+            Comment.objects.filter(pk__in=pending).update(
+                comment_approved=True, modified=timezone.now()
+            )
+            for count, birds in group_by_count(Counter(pending.values())):
+                Bird.objects.filter(pk__in=birds).adjust_counters(
+                    approved_comments=count
+                )
+            inbox = PendingModeration.objects.filter(comment__in=list(pending))
+            inbox.discard()
+            bump_bird_versions(*set(pending.values()))
+        return len(pending)
 
 
 class Comment(TimeStampedModel):
@@ -138,8 +522,23 @@ class Comment(TimeStampedModel):
         on_delete=models.CASCADE,
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            # the approved thread of a bird (Bird.approved_thread), the recount
+            models.Index(
+                fields=["bird", "comment_approved", "-created"],
+                name="comment_bird_approved_idx",
+            ),
+            # comments waiting for the photographer's approval
+            models.Index(
+                fields=["bird", "-created"],
+                condition=Q(comment_approved=False),
+                name="comment_pending_idx",
+            ),
+        ]
 
     def get_absolute_url(self):
         return reverse("bird_detail", kwargs={"pk": self.pk})
@@ -148,6 +547,42 @@ class Comment(TimeStampedModel):
         return self.comment
 
 
+class ReplyQuerySet(models.QuerySet):
+    def moderated_by(self, user):
+        """
+        The replies the user may approve: those on their own birds.
+        """
+        return self.filter(comment__bird__photographer=user)
+
+    def removable_by(self, user):
+        """
+        The replies the user may delete: their own and those on their own
+        birds.
+        """
+        owner = Q(comment__bird__photographer=user)
+        return self.filter(Q(reply_creator=user) | owner)
+
+    def approve(self):
+        """
+        Approves the pending replies of the queryset with a single
+        UPDATE ... WHERE id IN. Returns the number of replies approved.
+        """
+        with transaction.atomic(using=self.db):
+            locked = self.filter(reply_approved=False).select_for_update(
+                of=("self",),
+            )
+            replies = locked.select_related("comment").only("comment__bird")
+            pending = {reply.pk: reply.comment.bird_id for reply in replies}
+            if not pending:
+                return 0
+            Reply.objects.filter(pk__in=pending).update(
+                reply_approved=True, modified=timezone.now()
+            )
+            PendingModeration.objects.filter(reply__in=list(pending)).discard()
+            bump_bird_versions(*set(pending.values()))
+        return len(pending)
+
+
 class Reply(TimeStampedModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     reply = models.CharField(max_length=600, blank=False)
@@ -162,10 +597,248 @@ class Reply(TimeStampedModel):
         on_delete=models.CASCADE,
     )
 
+    objects = ReplyQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["comment", "reply_approved", "created"],
+                name="reply_comment_approved_idx",
+            ),
+            models.Index(
+                fields=["comment", "created"],
+                condition=Q(reply_approved=False),
+                name="reply_pending_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.reply
 
 
+class PendingModerationQuerySet(models.QuerySet):
+    def add(self, item):
+        """
+        Puts a comment or reply created unapproved in the inbox of the
+        photographer of its bird.
+        """
+        if isinstance(item, Comment):
+            bird = item.bird
+            fields = {"comment": item, "creator_id": item.comment_creator_id}
+        else:
+            bird = item.comment.bird
+            fields = {"reply": item, "creator_id": item.reply_creator_id}
+        self.create(
+            photographer_id=bird.photographer_id,
+            bird=bird,
+            created=item.created,
+            **fields,
+        )
+        self.recount([bird.photographer_id])
+
+    def discard(self):
+        """
+        Takes the items out of the inboxes (approved, or about to be
+        removed) and recounts the photographers concerned.
+        """
+        photographers = set(self.values_list("photographer_id", flat=True))
+        if photographers:
+            self.delete()
+            PendingModeration.objects.using(self.db).recount(photographers)
+
+    def rebuild(self):
+        """
+        Brings the inboxes back in line with the comments and replies
+        waiting for approval: the rows of approved items are dropped and
+        the missing ones created. Returns (removed, added), the counters
+        are left to recount().
+        """
+        inbox = PendingModeration.objects.using(self.db)
+        removed, _ = inbox.filter(
+            Q(comment__comment_approved=True) | Q(reply__reply_approved=True)
+        ).delete()
+        queued_comments = inbox.filter(comment__isnull=False).values("comment")
+        queued_replies = inbox.filter(reply__isnull=False).values("reply")
+        comments = (
+            Comment.objects.using(self.db)
+            .filter(comment_approved=False)
+            .exclude(pk__in=queued_comments)
+            .values_list(
+                "pk",
+                "bird_id",
+                "bird__photographer_id",
+                "comment_creator_id",
+                "created",
+            )
+        )
+        replies = (
+            Reply.objects.using(self.db)
+            .filter(reply_approved=False)
+            .exclude(pk__in=queued_replies)
+            .values_list(
+                "pk",
+                "comment__bird_id",
+                "comment__bird__photographer_id",
+                "reply_creator_id",
+                "created",
+            )
+        )
+        added = 0
+        for items, item_field in (
+            (comments, "comment_id"),
+            (replies, "reply_id"),
+        ):
+            # ignore_conflicts: an item put in its inbox meanwhile is kept
+            added += len(
+                inbox.bulk_create(
+                    (
+                        PendingModeration(
+                            bird_id=bird,
+                            photographer_id=photographer,
+                            creator_id=creator,
+                            created=created,
+                            **{item_field: pk},
+                        )
+                        for pk, bird, photographer, creator, created in items
+                    ),
+                    batch_size=1000,
+                    ignore_conflicts=True,
+                )
+            )
+        return removed, added
+
+    def recount(self, photographers):
+        """
+        Sets pending_moderation_count of the photographers (pks or a
+        values() queryset) from their inbox in one UPDATE, so the counter
+        cannot drift from the rows.
+        """
+        pending = (
+            PendingModeration.objects.using(self.db)
+            .filter(photographer=OuterRef("pk"))
+            .order_by()
+            .values("photographer")
+            .annotate(count=Count("pk"))
+        )
+        return (
+            get_user_model()
+            ._default_manager.using(self.db)
+            .filter(pk__in=photographers)
+            .update(
+                pending_moderation_count=Coalesce(
+                    Subquery(pending.values("count")),
+                    0,
+                )
+            )
+        )
+
+
+class PendingModeration(models.Model):
+    """
+    A comment or reply waiting for the photographer's approval: the inbox
+    read by the moderation queue, its size is kept on the photographer
+    (CustomUser.pending_moderation_count, the nav badge). The rows go with
+    their comment, reply or bird.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    photographer = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="+"
+    )
+    bird = models.ForeignKey(Bird, on_delete=models.CASCADE, related_name="+")
+    comment = models.OneToOneField(
+        Comment, null=True, on_delete=models.CASCADE, related_name="+"
+    )
+    reply = models.OneToOneField(
+        Reply, null=True, on_delete=models.CASCADE, related_name="+"
+    )
+    # the items of a removed account leave the inboxes with it
+    creator = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, related_name="+"
+    )
+    # when the item was created, the order of the queue
+    created = models.DateTimeField(default=timezone.now)
+
+    objects = PendingModerationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["photographer", "created"],
+                name="pending_photographer_idx",
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(comment__isnull=False, reply__isnull=True)
+                | Q(comment__isnull=True, reply__isnull=False),
+                name="pending_comment_or_reply",
+            ),
+        ]
+
+    def __str__(self):
+        item = self.comment or self.reply
+        return f"Pending for {self.photographer_id}: {item}"
+
+
+SEED_TOGGLE_SQL = """
+WITH deleted AS (
+    DELETE FROM birds_seed
+    WHERE seeder_id = %(seeder)s AND bird_id = %(bird)s
+    RETURNING id
+), inserted AS (
+    INSERT INTO birds_seed (id, seeded, seeder_id, bird_id)
+    SELECT %(id)s, true, %(seeder)s, %(bird)s
+    WHERE NOT EXISTS (SELECT 1 FROM deleted)
+        AND EXISTS (SELECT 1 FROM birds_bird WHERE id = %(bird)s)
+    ON CONFLICT (seeder_id, bird_id) DO NOTHING
+    RETURNING id
+)
+UPDATE birds_bird
+SET seed_count = seed_count
+    + (SELECT count(*) FROM inserted) - (SELECT count(*) FROM deleted)
+WHERE id = %(bird)s
+RETURNING NOT EXISTS (SELECT 1 FROM deleted), seed_count
+"""
+
+
+class SeedManager(models.Manager):
+    def toggle(self, seeder, bird_id):
+        """
+        Seeds the bird for the user, or removes the seed when there is one,
+        and keeps Bird.seed_count in step. Returns (seeded, seed_count), or
+        None when the bird does not exist.
+
+        On PostgreSQL it is a single statement (SEED_TOGGLE_SQL): concurrent
+        clicks either delete the row or hit the unique constraint, never
+        double count.
+        """
+        connection = connections[self.db]
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SEED_TOGGLE_SQL,
+                    {"id": uuid.uuid4(), "seeder": seeder.pk, "bird": bird_id},
+                )
+                row = cursor.fetchone()
+            if row is None:
+                return None
+            # raw SQL sends no post_save/post_delete (birds/signals.py)
+            bump_bird_versions(bird_id)
+            return tuple(row)
+
+        with transaction.atomic(using=self.db):
+            birds = Bird.objects.using(self.db).filter(pk=bird_id)
+            if not birds.exists():
+                return None
+            deleted, _ = self.filter(seeder=seeder, bird_id=bird_id).delete()
+            if not deleted:
+                self.create(seeder=seeder, bird_id=bird_id, seeded=True)
+            birds.adjust_counters(seeds=-1 if deleted else 1)
+            seed_count = birds.values_list("seed_count", flat=True).get()
+            return not deleted, seed_count
+
+
 class Seed(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     seeded = models.BooleanField(default=False)
@@ -179,5 +852,276 @@ class Seed(models.Model):
         related_name="seeds",
     )
 
+    objects = SeedManager()
+
+    class Meta:
+        constraints = [
+            # one seed per user and bird, also the index of the seed lookup
+            models.UniqueConstraint(
+                fields=["seeder", "bird"], name="seed_unique_seeder_bird"
+            ),
+        ]
+
     def __str__(self):
         return f"Seeder: {self.seeder} on bird {self.bird}"
+
+
+class ImageJobManager(models.Manager):
+    def enqueue(self, bird, kind="render"):
+        """
+        Queues a job for the image worker. With settings.IMAGE_QUEUE_EAGER
+        the job runs in-process as soon as the transaction commits.
+        A job still pending for the bird is reused, it reads the bird's
+        orientation only when it runs (several rotate clicks, one render).
+        """
+        job = self.filter(
+            bird=bird,
+            kind=kind,
+            status=ImageJob.Status.PENDING,
+        ).first()
+        if job is not None:
+            return job
+        job = self.create(bird=bird, kind=kind)
+        if settings.IMAGE_QUEUE_EAGER:
+            transaction.on_commit(job.run)
+        return job
+
+    def claim(self):
+        """
+        Marks the oldest pending job as running and returns it, or None when
+        the queue is empty. The conditional update makes sure two workers
+        never pick the same job.
+        """
+        pending = self.filter(status=ImageJob.Status.PENDING)
+        oldest = pending.order_by("created").values_list("pk", flat=True)
+        for job_id in oldest[:10]:
+            claimed = pending.filter(pk=job_id).update(
+                status=ImageJob.Status.RUNNING,
+                attempts=F("attempts") + 1,
+                modified=timezone.now(),
+            )
+            if claimed:
+                return self.select_related("bird").get(pk=job_id)
+        return None
+
+    def requeue_stale(self, older_than=timedelta(minutes=10)):
+        """
+        Jobs left running by a worker that died are put back in the queue.
+        """
+        return self.filter(
+            status=ImageJob.Status.RUNNING,
+            modified__lt=timezone.now() - older_than,
+        ).update(status=ImageJob.Status.PENDING)
+
+    def run_pending(self):
+        """
+        Drains the queue in the current process (used by tests and by
+        run_image_worker --once). Returns the number of jobs run.
+        """
+        count = 0
+        while job := self.claim():
+            job.run(claimed=True)
+            count += 1
+        return count
+
+
+class ImageJob(TimeStampedModel):
+    """
+    Database backed queue of the picture work (renditions of new uploads
+    and of rotated pictures) taken off the request/response cycle.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    class Kind(models.TextChoices):
+        RENDER = "render"
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    bird = models.ForeignKey(
+        Bird,
+        on_delete=models.CASCADE,
+        related_name="image_jobs",
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=Kind.choices,
+        default=Kind.RENDER,
+    )
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    objects = ImageJobManager()
+
+    class Meta:
+        ordering = ["created"]
+        indexes = [models.Index(fields=["status", "created"])]
+
+    def __str__(self):
+        return f"{self.kind} {self.bird_id} ({self.status})"
+
+    def run(self, claimed=False):
+        """
+        Does the actual image work. Failed jobs are retried up to
+        MAX_ATTEMPTS times before the bird is flagged as failed. Renditions
+        of an orientation the bird no longer has are thrown away.
+        """
+        if not claimed:
+            updated = ImageJob.objects.filter(
+                pk=self.pk, status=self.Status.PENDING
+            ).update(status=self.Status.RUNNING, attempts=F("attempts") + 1)
+            if not updated:
+                return
+            self.attempts += 1
+        # orientation may have changed since the job was queued
+        bird = Bird.objects.get(pk=self.bird_id)
+        storage = bird.picture.storage
+        try:
+            if is_staged(bird.picture.name):
+                self.ingest(bird, storage)
+            name = bird.picture.name
+            with metrics.timer("img"), storage.open(name, "rb") as picture:
+                renditions = build_renditions(
+                    Image.open(picture), bird.pk, storage, bird.orientation
+                )
+        except Exception as error:
+            # a rejected upload does not get better with retries
+            failed = self.attempts >= self.MAX_ATTEMPTS or isinstance(
+                error, ValidationError
+            )
+            self.status = self.Status.FAILED if failed else self.Status.PENDING
+            self.last_error = repr(error)
+            self.save(update_fields=["status", "last_error", "modified"])
+            if failed:
+                Bird.objects.filter(pk=bird.pk).update(
+                    picture_status=Bird.PictureStatus.FAILED
+                )
+                bump_bird_versions(bird.pk)
+                touch_feed()
+            return
+
+        with transaction.atomic():
+            # another job may have stored its renditions since this one read
+            # the bird (a rotate while it ran), the locked row has them
+            current = (
+                Bird.objects.select_for_update()
+                .only("renditions")
+                .filter(pk=bird.pk, orientation=bird.orientation)
+                .first()
+            )
+            if current is None:
+                # deleted or rotated again meanwhile, the job queued by the
+                # rotate renders the new orientation: these files are not kept
+                names = rendition_names(renditions)
+                StoredFile.objects.retain(names)
+                StoredFile.objects.release(names, storage)
+            else:
+                StoredFile.objects.replace(
+                    rendition_names(current.renditions),
+                    rendition_names(renditions),
+                    storage,
+                )
+                Bird.objects.filter(pk=bird.pk).update(
+                    renditions=renditions,
+                    picture_status=Bird.PictureStatus.READY,
+                    modified=timezone.now(),
+                )
+        if current is not None:
+            bump_bird_versions(bird.pk)
+            touch_feed()
+        self.status = self.Status.DONE
+        self.save(update_fields=["status", "modified"])
+
+    def ingest(self, bird, storage):
+        """
+        Moves a picture uploaded straight to the bucket out of the staging
+        area once it passed the checks (birds/uploads.py).
+        """
+        upload_to = bird.picture.field.upload_to
+        name = ingest_upload(bird.picture.name, storage, upload_to)
+        with transaction.atomic():
+            Bird.objects.filter(pk=bird.pk).update(picture=name)
+            StoredFile.objects.retain([name])
+        bird.picture.name = name
+
+
+class StoredFileManager(models.Manager):
+    def retain(self, names):
+        """
+        Counts one more reference to each of the names, a name listed twice
+        gets two.
+        """
+        counts = Counter(name for name in names if name)
+        if not counts:
+            return
+        self.bulk_create(
+            [StoredFile(name=name) for name in counts], ignore_conflicts=True
+        )
+        for count, group in group_by_count(counts):
+            self.filter(name__in=group).update(
+                references=F("references") + count,
+            )
+
+    def release(self, names, storage):
+        """
+        Counts one reference less to each of the names. The files left
+        without references are deleted from the storage once the
+        transaction commits. Names that were never retained (media/test_birds
+        shared by the generated birds, files saved before the counting) are
+        left alone.
+        """
+        counts = Counter(name for name in names if name)
+        if not counts:
+            return
+        for count, group in group_by_count(counts):
+            self.filter(name__in=group).update(
+                references=Greatest(F("references") - count, 0)
+            )
+        orphans = self.filter(name__in=counts, references=0)
+        unused = list(orphans.values_list("name", flat=True))
+        if unused:
+            self.filter(name__in=unused, references=0).delete()
+            transaction.on_commit(
+                lambda: self.delete_files(unused, storage), using=self.db
+            )
+
+    def replace(self, old_names, new_names, storage):
+        """
+        Moves the references of old_names to new_names, only the difference
+        is counted (a rebuilt rendition usually has the same content).
+        """
+        old_names, new_names = Counter(old_names), Counter(new_names)
+        self.retain((new_names - old_names).elements())
+        self.release((old_names - new_names).elements(), storage)
+
+    def delete_files(self, names, storage):
+        # the same content may have been saved (and retained) again since
+        stored = self.filter(name__in=names).values_list("name", flat=True)
+        retained = set(stored)
+        for name in names:
+            if name not in retained:
+                storage.delete(name)
+
+
+class StoredFile(models.Model):
+    """
+    Reference count of a file of the content-addressed media storage
+    (whistly/content_storage.py): birds share the files of identical
+    pictures and renditions, a file is deleted with its last reference.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    references = models.PositiveIntegerField(default=0)
+
+    objects = StoredFileManager()
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
@@ -0,0 +1,249 @@
+import datetime
+import json
+import uuid
+from functools import reduce
+
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connections
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+CURSOR_SALT = "birds.pagination.cursor"
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPaginator:
+    """
+    Keyset pagination: every page is fetched with a WHERE on the ordering
+    columns of the last (or first) row of the previous page instead of an
+    OFFSET, so page 1000 costs the same as page 1 when the ordering is
+    indexed, (-created, -id) for the feed and (-counter, -created) for the
+    sorted searches.
+
+    The ordering comes from the queryset and the primary key is appended
+    as tie-breaker so the ordering is total. Cursors are signed, so the
+    values in them can be trusted when building the WHERE.
+
+    There is no page count: the total is only computed when the template
+    asks for paginator.count, and with approximate_count=True PostgreSQL
+    answers with the planner estimate instead of a COUNT(*). Other
+    databases have no estimate, the count is None there.
+    """
+
+    def __init__(self, queryset, per_page, approximate_count=False):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.approximate_count = approximate_count
+        self.ordering = self.get_ordering(queryset)
+
+    @staticmethod
+    def get_ordering(queryset):
+        query = queryset.query
+        ordering = list(query.order_by or queryset.model._meta.ordering)
+        for field in ordering:
+            if not isinstance(field, str) or field.lstrip("-") == "?":
+                raise ImproperlyConfigured(
+                    "CursorPaginator needs an ordering made of field names, "
+                    f"got {field!r}."
+                )
+        pk_name = queryset.model._meta.pk.name
+        if not {"pk", pk_name} & {field.lstrip("-") for field in ordering}:
+            descending = bool(ordering) and ordering[0].startswith("-")
+            ordering.append(f"-{pk_name}" if descending else pk_name)
+        return ordering
+
+    @cached_property
+    def count(self):
+        queryset = self.queryset.order_by()
+        if self.approximate_count:
+            # never a COUNT(*) of the whole search behind the user's back
+            if connections[queryset.db].vendor != "postgresql":
+                return None
+            plan = json.loads(queryset.explain(format="json"))
+            return int(plan[0]["Plan"]["Plan Rows"])
+        return queryset.count()
+
+    def encode_cursor(self, direction, row):
+        values = [self.field_value(row, field) for field in self.ordering]
+        return signing.dumps(
+            [direction, values],
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor.")
+        known = direction in ("next", "previous")
+        if not known or len(values) != len(self.ordering):
+            raise InvalidCursor("Invalid cursor.")
+        return direction, values
+
+    @staticmethod
+    def field_value(row, field):
+        value = row
+        for attribute in field.lstrip("-").split("__"):
+            value = getattr(value, attribute)
+        if isinstance(value, datetime.datetime):
+            # isoformat keeps the microseconds, equality must be exact
+            return value.isoformat()
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return value
+
+    def seek(self, values, backwards):
+        """
+        The rows after values in the ordering (before them when going
+        backwards): a > x OR (a = x AND b > y) OR ..., with < for the
+        descending fields. The redundant a >= x in front is what lets the
+        database start the index scan at the cursor instead of filtering
+        every row before it.
+        """
+        first = self.ordering[0]
+        descending = first.startswith("-") != backwards
+        lookup = "lte" if descending else "gte"
+        bound = Q(**{f"{first.lstrip('-')}__{lookup}": values[0]})
+        conditions = []
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != backwards
+            condition = Q(
+                **{f"{name}__{'lt' if descending else 'gt'}": values[position]}
+            )
+            for previous, value in zip(self.ordering[:position], values):
+                condition &= Q(**{previous.lstrip("-"): value})
+            conditions.append(condition)
+        return bound & reduce(lambda left, right: left | right, conditions)
+
+    def page_queryset(self, cursor):
+        """
+        The query of the page after (or before) the cursor and whether it
+        goes backwards, one row more than per_page tells if there is more.
+        """
+        queryset = self.queryset
+        backwards = False
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+            backwards = direction == "previous"
+            try:
+                queryset = queryset.filter(self.seek(values, backwards))
+            except (ValidationError, ValueError, TypeError):
+                raise InvalidCursor("Invalid cursor.")
+        ordering = self.ordering
+        if backwards:
+            ordering = [
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            ]
+        return queryset.order_by(*ordering)[: self.per_page + 1], backwards
+
+    def build_page(self, rows, cursor, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+            return CursorPage(rows, self, has_next=True, has_previous=has_more)
+        return CursorPage(
+            rows,
+            self,
+            has_next=has_more,
+            has_previous=bool(cursor),
+        )
+
+    def page(self, cursor=None):
+        queryset, backwards = self.page_queryset(cursor)
+        return self.build_page(list(queryset), cursor, backwards)
+
+    async def apage(self, cursor=None):
+        queryset, backwards = self.page_queryset(cursor)
+        rows = [row async for row in queryset]
+        return self.build_page(rows, cursor, backwards)
+
+
+class CursorPage:
+    """
+    Mirrors the parts of django.core.paginator.Page the templates use.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return f"<CursorPage of {len(self.object_list)} objects>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @cached_property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor("next", self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor("previous", self.object_list[0])
+
+
+class CursorPaginationMixin:
+    """
+    Swaps the OFFSET pagination of a ListView for CursorPaginator. The
+    cursor travels in ?cursor=, the other GET parameters (q, order_by) are
+    kept by pagination.html.
+    """
+
+    paginator_class = CursorPaginator
+    cursor_kwarg = "cursor"
+    approximate_count = False
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = self.paginator_class(
+            queryset, page_size, approximate_count=self.approximate_count
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidPage as error:
+            raise Http404(str(error))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        paginate_queryset() for the async views (pages/async_views.py).
+        """
+        paginator = self.paginator_class(
+            queryset, page_size, approximate_count=self.approximate_count
+        )
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        try:
+            page = await paginator.apage(cursor)
+        except InvalidPage as error:
+            raise Http404(str(error))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_bird_versions, touch_feed
+from .models import Bird, Comment, PendingModeration, Reply, Seed, StoredFile
+
+# Saving/deleting anything shown on a bird page invalidates its cached
+# fragments. Changes made with QuerySet.update() send no signal, those
+# call bump_bird_versions() themselves. Pending comments and replies are
+# rendered outside the fragments, they leave them alone (deleting a batch of
+# them from the moderation queue sends no bumps and runs no lookups).
+
+
+@receiver([post_save, post_delete], sender=Bird)
+def bird_changed(sender, instance, **kwargs):
+    bump_bird_versions(instance.pk)
+    touch_feed()
+
+
+@receiver(post_delete, sender=Bird)
+def bird_deleted(sender, instance, **kwargs):
+    # the files go with the last bird using them (BirdDeleteView, removed
+    # accounts)
+    StoredFile.objects.release(instance.stored_names, instance.picture.storage)
+    # its pending comments and replies left the photographer's inbox
+    PendingModeration.objects.recount([instance.photographer_id])
+
+
+@receiver(pre_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    # the pending comments and replies of a removed account leave the inboxes
+    # of the photographers they were written to
+    PendingModeration.objects.filter(creator=instance).discard()
+
+
+@receiver([post_save, post_delete], sender=Seed)
+def bird_relation_changed(sender, instance, **kwargs):
+    bump_bird_versions(instance.bird_id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    if instance.comment_approved:
+        bump_bird_versions(instance.bird_id)
+
+
+@receiver([post_save, post_delete], sender=Reply)
+def reply_changed(sender, instance, **kwargs):
+    if not instance.reply_approved:
+        return
+    if Reply.comment.is_cached(instance):
+        bird_id = instance.comment.bird_id
+    else:
+        bird_id = (
+            Comment.objects.filter(pk=instance.comment_id)
+            .values_list("bird_id", flat=True)
+            .first()
+        )
+    # None when the comment is already gone, its own post_delete bumps the bird
+    if bird_id is not None:
+        bump_bird_versions(bird_id)
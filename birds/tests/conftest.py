@@ -0,0 +1,253 @@
+"""
+Benchmarks of the hot views and of the image pipeline, on SQLite or on
+PostgreSQL:
+
+    DATABASE_URL=sqlite:////tmp/whistly.sqlite3 pytest
+    pytest  # POSTGRES_* settings
+
+The test database is seeded once per session with generate_load_data. Every
+benchmark records its query count, median wall time and peak memory and
+compares its query count with baselines/<database vendor>.json: one query
+more fails the test. Wall time and memory depend on the machine, they are
+only compared with --benchmark-compare, where a time/memory above the
+baseline by more than --benchmark-threshold fails the test.
+--benchmark-save writes the results of the run as the new baseline (the
+committed ones use the default --benchmark-birds).
+"""
+
+import json
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+from statistics import median
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+BASELINES_DIR = Path(__file__).parent / "baselines"
+
+# differences below these are noise, whatever the threshold
+MIN_TIME_MS = 2
+MIN_MEMORY_KB = 256
+
+results_key = pytest.StashKey[dict]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("benchmark")
+    group.addoption(
+        "--benchmark-birds",
+        type=int,
+        default=500,
+        help="Birds, with comments, replies and seeds, of the database.",
+    )
+    group.addoption(
+        "--benchmark-rounds",
+        type=int,
+        default=10,
+        help="Timed runs of every benchmark, the median is kept.",
+    )
+    group.addoption(
+        "--benchmark-threshold",
+        type=float,
+        default=0.5,
+        help="Allowed growth over the baseline (0.5 = 50%%).",
+    )
+    group.addoption(
+        "--benchmark-compare",
+        action="store_true",
+        help="Also compare the wall time and memory with the baseline.",
+    )
+    group.addoption(
+        "--benchmark-save",
+        action="store_true",
+        help="Write the results as the baseline instead of comparing.",
+    )
+
+
+def pytest_configure(config):
+    config.stash[results_key] = {}
+
+
+def pytest_sessionfinish(session):
+    results = session.config.stash.get(results_key, {})
+    if not session.config.getoption("--benchmark-save") or not results:
+        return
+    BASELINES_DIR.mkdir(exist_ok=True)
+    path = BASELINES_DIR / f"{connection.vendor}.json"
+    baseline = json.loads(path.read_text()) if path.exists() else {}
+    baseline.update(results)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+def peak_rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+
+def current_rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+
+
+def reset_peak_rss():
+    """
+    Resets the high water mark of the resident memory (Linux only), Pillow
+    allocates its pixel buffers outside of the Python allocator, tracemalloc
+    does not see them.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class Benchmark:
+    def __init__(self, name, config):
+        self.name = name
+        self.rounds = config.getoption("--benchmark-rounds")
+        self.threshold = config.getoption("--benchmark-threshold")
+        self.save = config.getoption("--benchmark-save")
+        self.compare = config.getoption("--benchmark-compare")
+        self.results = config.stash[results_key]
+        path = BASELINES_DIR / f"{connection.vendor}.json"
+        self.baseline = (
+            json.loads(path.read_text()).get(name) if path.exists() else None
+        )
+
+    def __call__(self, function, rss=False):
+        """
+        Runs function once to warm up (imports, templates, cached fragments),
+        once counting its queries, --benchmark-rounds times timed and once
+        tracing its memory. rss=True also measures the peak resident memory.
+        """
+        function()
+        with CaptureQueriesContext(connection) as queries:
+            function()
+        # the log is emptied by the next request, count now
+        query_count = len(queries)
+
+        timings = []
+        for _ in range(self.rounds):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            function()
+            python_peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            "queries": query_count,
+            "median_ms": round(median(timings) * 1000, 2),
+            "python_peak_kb": python_peak // 1024,
+        }
+        if rss and reset_peak_rss():
+            before = current_rss_kb()
+            function()
+            result["rss_peak_kb"] = peak_rss_kb() - before
+
+        self.results[self.name] = result
+        if not self.save:
+            self.check(result)
+        return result
+
+    def check(self, result):
+        if self.baseline is None:
+            return
+        failures = []
+        queries, expected = result["queries"], self.baseline["queries"]
+        if queries > expected:
+            failures.append(f"{queries} queries, {expected} expected")
+        if self.compare:
+            failures.extend(self.compare_measures(result))
+        if failures:
+            pytest.fail(f"{self.name} regressed: " + ", ".join(failures))
+
+    def compare_measures(self, result):
+        for key, slack in (
+            ("median_ms", MIN_TIME_MS),
+            ("python_peak_kb", MIN_MEMORY_KB),
+            ("rss_peak_kb", MIN_MEMORY_KB),
+        ):
+            if key not in result or key not in self.baseline:
+                continue
+            baseline = self.baseline[key]
+            limit = max(baseline * (1 + self.threshold), baseline + slack)
+            value = result[key]
+            if value > limit:
+                yield f"{key} {value}, baseline {baseline} (limit {limit:.0f})"
+
+
+@pytest.fixture
+def benchmark(request):
+    return Benchmark(request.node.name, request.config)
+
+
+@pytest.fixture(scope="session")
+def media_root(tmp_path_factory):
+    """
+    A throwaway MEDIA_ROOT with a couple of test_birds pictures for the
+    seeded birds and the uploads of the benchmarks.
+    """
+    root = tmp_path_factory.mktemp("media")
+    (root / "test_birds").mkdir()
+    for number, color in enumerate(((90, 120, 30), (200, 160, 40))):
+        Image.new("RGB", (2400, 1600), color).save(
+            root / "test_birds" / f"bird{number}.jpg", quality=90
+        )
+    with override_settings(MEDIA_ROOT=str(root)):
+        yield root
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker, media_root, request):
+    with django_db_blocker.unblock():
+        call_command(
+            "generate_load_data",
+            users=max(request.config.getoption("--benchmark-birds") // 10, 10),
+            birds=request.config.getoption("--benchmark-birds"),
+            processes=1,
+            stdout=StringIO(),
+        )
+
+
+@pytest.fixture
+def upload(media_root):
+    """
+    Bytes of a fresh 12 megapixel JPEG, the kind of picture phones upload.
+    """
+    path = media_root / "upload.jpg"
+    if not path.exists():
+        Image.new("RGB", (4000, 3000), (30, 90, 160)).save(path, quality=90)
+    return path.read_bytes()
+
+
+@pytest.fixture(autouse=True)
+def static_files_storage(settings):
+    # the manifest of the whitenoise storage is written by collectstatic
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+    }
+
+
+@pytest.fixture(autouse=True)
+def eager_image_queue(settings):
+    # the benchmarks run the image jobs themselves
+    settings.IMAGE_QUEUE_EAGER = False
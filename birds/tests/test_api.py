@@ -0,0 +1,56 @@
+import uuid
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+
+from birds.cache import VERSION_KEY
+from birds.models import Bird
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bird():
+    return Bird.objects.order_by("-approved_comment_count", "pk").first()
+
+
+@pytest.mark.parametrize(
+    "name", ["api_birds", "api_bird", "api_bird_comments", "api_bird_seeds"]
+)
+def test_api_needs_login(client, bird, name):
+    kwargs = {} if name == "api_birds" else {"pk": bird.pk}
+    url = reverse(name, kwargs=kwargs)
+    response = client.get(url, {"include": "comments"})
+
+    assert response.status_code == 401
+    assert response.json() == {"error": "Authentication required."}
+
+
+def test_api_bird_for_logged_in_user(client, bird):
+    client.force_login(get_user_model().objects.order_by("username").first())
+    response = client.get(
+        reverse("api_bird", kwargs={"pk": bird.pk}), {"include": "comments"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["data"]["id"] == str(bird.pk)
+
+
+def test_api_unknown_bird_creates_no_version(client):
+    client.force_login(get_user_model().objects.order_by("username").first())
+    pk = uuid.uuid4()
+    response = client.get(reverse("api_bird", kwargs={"pk": pk}))
+
+    assert response.status_code == 404
+    assert cache.get(VERSION_KEY.format(pk)) is None
+
+
+def test_api_bird_etag_survives_the_first_request(client, bird):
+    client.force_login(get_user_model().objects.order_by("username").first())
+    url = reverse("api_bird", kwargs={"pk": bird.pk})
+    cache.delete(VERSION_KEY.format(bird.pk))
+    etag = client.get(url)["ETag"]
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
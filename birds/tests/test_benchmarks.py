@@ -0,0 +1,149 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from birds.models import Bird, ImageJob
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bird():
+    """
+    The seeded bird with the most comments, the heaviest detail page.
+    """
+    return Bird.objects.order_by(
+        "-approved_comment_count",
+        "-seed_count",
+        "pk",
+    ).first()
+
+
+@pytest.fixture
+def logged_client(client, bird):
+    # the photographer sees the pending comments of their bird too
+    client.force_login(bird.photographer)
+    return client
+
+
+@pytest.fixture
+def visitor_client(client):
+    client.force_login(get_user_model().objects.order_by("username").first())
+    return client
+
+
+def get(client, url, **params):
+    def request():
+        response = client.get(url, params)
+        assert response.status_code == 200
+
+    return request
+
+
+# views, with the cached fragments warm
+
+
+def test_birds_nest(benchmark, visitor_client):
+    benchmark(get(visitor_client, reverse("birds_nest")))
+
+
+def test_birds_nest_next_page(benchmark, visitor_client):
+    response = visitor_client.get(reverse("birds_nest"))
+    cursor = response.context["page_obj"].next_cursor
+    benchmark(get(visitor_client, reverse("birds_nest"), cursor=cursor))
+
+
+def test_bird_detail(benchmark, logged_client, bird):
+    url = reverse("bird_detail", kwargs={"pk": bird.pk})
+    benchmark(get(logged_client, url))
+
+
+def test_bird_detail_cold_cache(benchmark, logged_client, bird):
+    url = reverse("bird_detail", kwargs={"pk": bird.pk})
+
+    def request():
+        cache.clear()
+        get(logged_client, url)()
+
+    benchmark(request)
+
+
+def test_search(benchmark, visitor_client, bird):
+    benchmark(get(visitor_client, reverse("search_results"), q=bird.species))
+
+
+def test_search_order_by_seeds(benchmark, visitor_client):
+    benchmark(get(visitor_client, reverse("search_results"), order_by="seeds"))
+
+
+def test_profile_detail(benchmark, visitor_client, bird):
+    url = reverse("profile_detail", kwargs={"pk": bird.photographer_id})
+    benchmark(get(visitor_client, url))
+
+
+def test_seed_toggle(benchmark, visitor_client, bird):
+    url = reverse("seed", kwargs={"pk": bird.pk})
+
+    def toggle():
+        response = visitor_client.post(url, HTTP_ACCEPT="application/json")
+        assert response.status_code == 200
+
+    benchmark(toggle)
+
+
+def test_api_birds(benchmark, visitor_client):
+    # a feed page with its comments and replies, what the clients scraped
+    url = reverse("api_birds")
+    include = "comments.replies"
+    benchmark(get(visitor_client, url, include=include, page_size=20))
+
+
+def test_api_bird_not_modified(benchmark, visitor_client, bird):
+    url = reverse("api_bird", kwargs={"pk": bird.pk})
+    etag = visitor_client.get(url, {"include": "comments"})["ETag"]
+
+    def request():
+        response = visitor_client.get(
+            url, {"include": "comments"}, HTTP_IF_NONE_MATCH=etag
+        )
+        assert response.status_code == 304
+
+    benchmark(request)
+
+
+# image pipeline
+
+
+def test_bird_save_with_upload(benchmark, bird, upload):
+    def save():
+        Bird(
+            species="Benchmark robin",
+            location="Lisbon",
+            photographer_id=bird.photographer_id,
+            photographer_comment="Singing on the fence.",
+            picture=SimpleUploadedFile("robin.jpg", upload, "image/jpeg"),
+        ).save()
+
+    benchmark(save, rss=True)
+
+
+def test_rotate(benchmark, bird):
+    benchmark(bird.rotate_left)
+
+
+def test_image_job(benchmark, bird, upload):
+    uploaded = Bird(
+        species="Benchmark robin",
+        location="Lisbon",
+        photographer_id=bird.photographer_id,
+        photographer_comment="Singing on the fence.",
+        picture=SimpleUploadedFile("robin.jpg", upload, "image/jpeg"),
+    )
+    uploaded.save()
+    job = ImageJob.objects.get(bird=uploaded)
+
+    benchmark(lambda: job.run(claimed=True), rss=True)
+    uploaded.refresh_from_db()
+    assert uploaded.picture_status == Bird.PictureStatus.READY
@@ -0,0 +1,60 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from birds.models import Bird, Comment, PendingModeration, Reply
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def seeded():
+    return Bird.objects.exclude(renditions={}).order_by("pk").first()
+
+
+def test_backfill_renditions_marks_the_picture_ready(seeded):
+    bird = Bird.objects.create(
+        species="Unrendered robin",
+        picture=seeded.picture.name,
+        photographer=seeded.photographer,
+    )
+    assert bird.picture_status == Bird.PictureStatus.PROCESSING
+
+    call_command("backfill_renditions", stdout=StringIO())
+
+    bird.refresh_from_db()
+    assert bird.renditions
+    assert bird.picture_status == Bird.PictureStatus.READY
+
+
+def test_recount_birds_rebuilds_the_inboxes(seeded):
+    photographer = seeded.photographer
+    visitor = get_user_model().objects.exclude(pk=photographer.pk).first()
+    approved = Comment.objects.create(
+        bird=seeded,
+        comment="Approved behind the inbox",
+        comment_creator=visitor,
+    )
+    PendingModeration.objects.add(approved)
+    Comment.objects.filter(pk=approved.pk).update(comment_approved=True)
+    # created without their inbox rows
+    missing = Comment.objects.create(
+        bird=seeded, comment="Never in the inbox", comment_creator=visitor
+    )
+    reply = Reply.objects.create(
+        comment=approved, reply="Neither am I", reply_creator=visitor
+    )
+    get_user_model().objects.filter(pk=photographer.pk).update(
+        pending_moderation_count=999
+    )
+
+    call_command("recount_birds", stdout=StringIO())
+
+    inbox = PendingModeration.objects.filter(photographer=photographer)
+    assert not inbox.filter(comment=approved).exists()
+    assert inbox.filter(comment=missing, bird=seeded, creator=visitor).exists()
+    assert inbox.filter(reply=reply, bird=seeded, creator=visitor).exists()
+    photographer.refresh_from_db()
+    assert photographer.pending_moderation_count == inbox.count()
@@ -0,0 +1,74 @@
+from collections import Counter
+from io import BytesIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from birds import models
+from birds.images import rendition_names
+from birds.models import Bird, ImageJob, StoredFile
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bird():
+    picture = BytesIO()
+    Image.new("RGB", (400, 300), (120, 40, 200)).save(picture, "JPEG")
+    bird = Bird.objects.create(
+        species="Rotated robin",
+        location="Lisbon",
+        photographer=Bird.objects.first().photographer,
+        photographer_comment="Turned on its side.",
+        picture=SimpleUploadedFile("robin.jpg", picture.getvalue()),
+    )
+    ImageJob.objects.get(bird=bird).run()
+    bird.refresh_from_db()
+    return bird
+
+
+@pytest.mark.parametrize("rotations", [[90], [90, 270]])
+def test_overlapping_image_jobs(
+    bird, monkeypatch, django_capture_on_commit_callbacks, rotations
+):
+    """
+    A rotate while a job renders queues a second job: the bird ends up with
+    the renditions of its last orientation and every file counted once per
+    use, the rendered files nobody uses are deleted.
+    """
+    build_renditions = models.build_renditions
+    rendered = []
+
+    def render_then_rotate(*args):
+        renditions = build_renditions(*args)
+        rendered.extend(rendition_names(renditions))
+        monkeypatch.setattr(models, "build_renditions", build_renditions)
+        for degrees in rotations:
+            Bird.objects.get(pk=bird.pk).rotate(degrees)
+        pending = ImageJob.Status.PENDING
+        ImageJob.objects.get(bird=bird, status=pending).run()
+        return renditions
+
+    initial = rendition_names(bird.renditions)
+    bird.rotate(90)
+    job = ImageJob.objects.get(bird=bird, status=ImageJob.Status.PENDING)
+    monkeypatch.setattr(models, "build_renditions", render_then_rotate)
+    with django_capture_on_commit_callbacks(execute=True):
+        job.run()
+
+    bird.refresh_from_db()
+    assert bird.orientation == (90 + sum(rotations)) % 360
+    assert bird.picture_status == Bird.PictureStatus.READY
+    # rendered for the orientation the bird has
+    renditions = bird.renditions
+    ImageJob.objects.enqueue(bird).run()
+    bird.refresh_from_db()
+    assert bird.renditions == renditions
+    used = Counter(rendition_names(bird.renditions))
+    names = {*initial, *rendered, *used}
+    stored = StoredFile.objects.filter(name__in=names)
+    assert dict(stored.values_list("name", "references")) == used
+    for name in names:
+        assert default_storage.exists(name) == (name in used)
@@ -0,0 +1,43 @@
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from birds.uploads import STAGING_DIR
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def stored():
+    name = default_storage.save("bird/served.txt", ContentFile(b"0123456789"))
+    yield name
+    default_storage.delete(name)
+
+
+def test_media_is_served_with_ranges(client, stored):
+    response = client.get(f"/media/{stored}", HTTP_RANGE="bytes=2-5")
+
+    assert response.status_code == 206
+    assert b"".join(response.streaming_content) == b"2345"
+    assert response["Content-Range"] == "bytes 2-5/10"
+
+
+@pytest.fixture
+def staged():
+    name = default_storage.save(f"{STAGING_DIR}/staged.jpg", ContentFile(b"x"))
+    yield name
+    default_storage.delete(name)
+
+
+@pytest.mark.parametrize("path", ["{}", "bird/../{}", "./{}"])
+def test_staged_uploads_are_not_served(client, staged, path):
+    response = client.get("/media/" + path.format(staged))
+
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("path", ["bird/missing.jpg", "bird/", "bird/a\0b"])
+def test_missing_media_is_not_found(client, path):
+    response = client.get(f"/media/{path}")
+
+    assert response.status_code == 404
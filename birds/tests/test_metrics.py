@@ -0,0 +1,32 @@
+import pytest
+from django.core.exceptions import PermissionDenied
+from django.test import RequestFactory
+
+from whistly.metrics import metrics_view
+
+
+@pytest.mark.parametrize(
+    "token, authorization",
+    [("", ""), ("", "Bearer "), ("secret", ""), ("secret", "Bearer wrong")],
+)
+def test_metrics_need_the_token(settings, token, authorization):
+    settings.PERFORMANCE_METRICS_TOKEN = token
+    request = RequestFactory().get(
+        "/metrics/",
+        HTTP_AUTHORIZATION=authorization,
+    )
+
+    with pytest.raises(PermissionDenied):
+        metrics_view(request)
+
+
+def test_metrics_for_the_scraper(settings):
+    settings.PERFORMANCE_METRICS_TOKEN = "secret"
+    request = RequestFactory().get(
+        "/metrics/",
+        HTTP_AUTHORIZATION="Bearer secret",
+    )
+    response = metrics_view(request)
+
+    assert response.status_code == 200
+    assert response["Content-Type"].startswith("text/plain")
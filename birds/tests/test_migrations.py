@@ -0,0 +1,28 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+
+from birds.models import Bird, ImageJob
+
+pytestmark = pytest.mark.django_db
+
+
+def test_pending_rotations_are_added_up():
+    migration = import_module("birds.migrations.0004_bird_orientation")
+    turned, untouched = Bird.objects.order_by("pk")[:2]
+    ImageJob.objects.filter(bird__in=[turned, untouched]).delete()
+    for kind in ["rotate_right"] * 3 + ["rotate_left"]:
+        ImageJob.objects.create(bird=turned, kind=kind)
+    for kind in ["rotate_left", "rotate_right"]:
+        ImageJob.objects.create(bird=untouched, kind=kind)
+
+    migration.convert_rotation_jobs(apps, None)
+
+    turned_to = (turned.orientation + 180) % 360
+    assert Bird.objects.get(pk=turned.pk).orientation == turned_to
+    untouched_to = untouched.orientation
+    assert Bird.objects.get(pk=untouched.pk).orientation == untouched_to
+    for bird in (turned, untouched):
+        kinds = ImageJob.objects.filter(bird=bird).values_list("kind")
+        assert list(kinds) == [("render",)]
@@ -0,0 +1,96 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from birds.models import Bird
+from birds.pagination import CursorPaginator
+
+pytestmark = pytest.mark.django_db
+
+ORDER_BY = [None, "comment", "seed", "species", "photographer"]
+
+
+@pytest.fixture
+def birds():
+    """
+    Forty birds, seven of them tied on every sort key (the primary key
+    breaks the ties).
+    """
+    pks = list(Bird.objects.order_by("pk").values_list("pk", flat=True)[:40])
+    Bird.objects.filter(pk__in=pks[:7]).update(
+        created=timezone.now(),
+        species="Tied robin",
+        seed_count=3,
+        approved_comment_count=2,
+        photographer=Bird.objects.get(pk=pks[0]).photographer,
+    )
+    return Bird.objects.filter(pk__in=pks).select_related("photographer")
+
+
+def test_approximate_count_is_an_estimate_or_none(django_assert_num_queries):
+    paginator = CursorPaginator(
+        Bird.objects.order_by("-created"), 10, approximate_count=True
+    )
+    if connection.vendor == "postgresql":
+        with django_assert_num_queries(1) as captured:
+            assert paginator.count >= 0
+        assert captured.captured_queries[0]["sql"].startswith("EXPLAIN")
+    else:
+        with django_assert_num_queries(0):
+            assert paginator.count is None
+
+
+def test_exact_count():
+    paginator = CursorPaginator(Bird.objects.order_by("-created"), 10)
+
+    assert paginator.count == Bird.objects.count()
+
+
+@pytest.mark.parametrize("order_by", ORDER_BY)
+def test_cursor_round_trip(birds, order_by):
+    queryset = birds.search_results(order_by=order_by)
+    paginator = CursorPaginator(queryset, 3)
+    page = paginator.page()
+    pages = [list(page)]
+    while page.has_next():
+        page = paginator.page(page.next_cursor)
+        pages.append(list(page))
+
+    ordered = list(queryset.order_by(*paginator.ordering))
+    assert [bird for rows in pages for bird in rows] == ordered
+    for rows in reversed(pages[:-1]):
+        page = paginator.page(page.previous_cursor)
+        assert list(page) == rows
+    assert not page.has_previous()
+
+
+def cursor(order_by=None):
+    queryset = Bird.objects.search_results(order_by=order_by)
+    return CursorPaginator(queryset, 9).page().next_cursor
+
+
+def swap_signature(cursor, other):
+    return cursor.rsplit(":", 1)[0] + ":" + other.rsplit(":", 1)[1]
+
+
+@pytest.mark.parametrize(
+    "make_cursor",
+    [
+        lambda: "not-a-cursor",
+        # the values of a cursor with the signature of another
+        lambda: swap_signature(cursor(), cursor("seed")),
+        # signed for other orderings: more values, values of other types
+        lambda: cursor("seed"),
+        lambda: cursor("species"),
+    ],
+)
+def test_invalid_cursor_is_not_found(client, make_cursor):
+    client.force_login(get_user_model().objects.first())
+    url = reverse("birds_nest")
+    assert client.get(url, {"cursor": cursor()}).status_code == 200
+
+    response = client.get(url, {"cursor": make_cursor()})
+
+    assert response.status_code == 404
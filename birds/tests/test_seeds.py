@@ -0,0 +1,106 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.urls import reverse
+
+from birds.models import Bird, Seed
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bird():
+    return Bird.objects.order_by("pk").first()
+
+
+@pytest.fixture
+def seeder(bird):
+    return get_user_model().objects.exclude(pk=bird.photographer_id).first()
+
+
+def test_toggle_twice_restores_the_seed(bird, seeder):
+    seeded = Seed.objects.filter(seeder=seeder, bird=bird).exists()
+
+    first = Seed.objects.toggle(seeder, bird.pk)
+    second = Seed.objects.toggle(seeder, bird.pk)
+
+    step = -1 if seeded else 1
+    assert first == (not seeded, bird.seed_count + step)
+    assert second == (seeded, bird.seed_count)
+    assert Seed.objects.filter(seeder=seeder, bird=bird).exists() == seeded
+    assert Bird.objects.get(pk=bird.pk).seed_count == bird.seed_count
+
+
+def test_repeated_toggles_keep_the_counter_in_sync(bird):
+    users = get_user_model().objects.order_by("pk")[:3]
+    rows = Seed.objects.filter(bird=bird).count() - bird.seed_count
+
+    for user in [*users, *users, *users, users[0]]:
+        Seed.objects.toggle(user, bird.pk)
+
+    seeds = Seed.objects.filter(bird=bird)
+    assert seeds.count() - Bird.objects.get(pk=bird.pk).seed_count == rows
+    assert seeds.filter(seeder=users[0]).count() <= 1
+
+
+def test_toggle_of_a_missing_bird(client, seeder):
+    missing = uuid.uuid4()
+
+    assert Seed.objects.toggle(seeder, missing) is None
+
+    client.force_login(seeder)
+    response = client.post(reverse("seed", kwargs={"pk": missing}))
+    assert response.status_code == 404
+    assert not Seed.objects.filter(bird_id=missing).exists()
+
+
+def committed(function, *args, **kwargs):
+    """
+    Runs function in a thread of its own: its own connection, in
+    autocommit, outside of the transaction of the test.
+    """
+
+    def run():
+        try:
+            return function(*args, **kwargs)
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(1) as pool:
+        return pool.submit(run).result()
+
+
+@pytest.mark.skipif(
+    connection.vendor != "postgresql",
+    reason="SQLite runs one writer at a time",
+)
+def test_concurrent_toggles_keep_the_counter_in_sync(bird, seeder):
+    contested = committed(
+        Bird.objects.create,
+        species="Contested robin",
+        picture=bird.picture.name,
+        photographer=bird.photographer,
+    )
+    clicks = 8
+    barrier = threading.Barrier(clicks)
+
+    def click(_):
+        barrier.wait()
+        try:
+            return Seed.objects.toggle(seeder, contested.pk)
+        finally:
+            connections.close_all()
+
+    try:
+        with ThreadPoolExecutor(clicks) as pool:
+            results = list(pool.map(click, range(clicks)))
+        seeds = Seed.objects.filter(bird=contested).count()
+        assert seeds <= 1
+        assert Bird.objects.get(pk=contested.pk).seed_count == seeds
+        assert all(seed_count in (0, 1) for _, seed_count in results)
+    finally:
+        committed(Bird.objects.filter(pk=contested.pk).delete)
@@ -0,0 +1,195 @@
+import base64
+import json
+from io import BytesIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+from birds.models import Bird, ImageJob
+from birds.uploads import STAGING_DIR, ingest_upload, is_staged
+from birds.utils import MAX_PICTURE_SIZE
+
+moto = pytest.importorskip("moto")
+
+pytestmark = pytest.mark.django_db
+
+BUCKET = "whistly-tests"
+
+
+@pytest.fixture
+def s3(settings, monkeypatch):
+    """
+    The media on a mocked bucket (DeduplicatedMediaStorage), with direct
+    uploads on.
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        settings.AWS_STORAGE_BUCKET_NAME = BUCKET
+        settings.AWS_S3_REGION_NAME = "us-east-1"
+        settings.AWS_S3_CUSTOM_DOMAIN = None
+        settings.DIRECT_UPLOADS = True
+        settings.STORAGES = {
+            **settings.STORAGES,
+            "default": {
+                "BACKEND": "whistly.storage_backends.DeduplicatedMediaStorage",
+            },
+        }
+        default_storage.connection.meta.client.create_bucket(Bucket=BUCKET)
+        yield default_storage
+
+
+@pytest.fixture
+def users():
+    return get_user_model().objects.order_by("username")[:2]
+
+
+def jpeg_bytes():
+    content = BytesIO()
+    Image.new("RGB", (640, 480), (30, 90, 160)).save(content, "JPEG")
+    return content.getvalue()
+
+
+def stage(storage, data, name=f"{STAGING_DIR}/staged.jpg"):
+    """
+    Puts data where the browser POST to the presigned url leaves it (the
+    storage's own save would rename it after its content).
+    """
+    storage.bucket.put_object(Key=f"{storage.location}/{name}", Body=data)
+    return name
+
+
+def presign(client, content_type="image/jpeg", size=1000):
+    return client.post(
+        reverse("presign_upload"), {"content_type": content_type, "size": size}
+    )
+
+
+def test_presign_upload_fields(client, s3, users):
+    client.force_login(users[0])
+    response = presign(client)
+
+    assert response.status_code == 200
+    post = response.json()
+    fields = post["fields"]
+    assert post["url"].startswith("https://")
+    assert fields["key"].startswith(f"media/{STAGING_DIR}/")
+    assert fields["key"].endswith(".jpg")
+    assert fields["Content-Type"] == "image/jpeg"
+    policy = json.loads(base64.b64decode(fields["policy"]))
+    size_range = ["content-length-range", 1, MAX_PICTURE_SIZE]
+    assert size_range in policy["conditions"]
+    assert {"Content-Type": "image/jpeg"} in policy["conditions"]
+    assert post["upload"]
+
+
+@pytest.mark.parametrize(
+    "content_type, size, error",
+    [
+        ("application/pdf", 1000, "Only JPEG, PNG, WebP and GIF pictures."),
+        ("image/jpeg", MAX_PICTURE_SIZE + 1, "File too large."),
+        ("image/jpeg", 0, "File too large."),
+        ("image/jpeg", "", "File too large."),
+    ],
+)
+def test_presign_upload_rejects(client, s3, users, content_type, size, error):
+    client.force_login(users[0])
+    response = presign(client, content_type, size)
+
+    assert response.status_code == 400
+    assert response.json() == {"error": error}
+
+
+def test_presign_upload_disabled(client, s3, users, settings):
+    settings.DIRECT_UPLOADS = False
+    client.force_login(users[0])
+
+    assert presign(client).status_code == 404
+
+
+def test_direct_upload_of_another_user_is_refused(client, s3, users):
+    owner, other = users
+    client.force_login(owner)
+    upload = presign(client).json()["upload"]
+    client.force_login(other)
+    response = client.post(
+        reverse("add_bird"),
+        {
+            "species": "Borrowed robin",
+            "location": "Here",
+            "photographer_comment": "Not mine",
+            "upload": upload,
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.context["form"].errors["upload"] == ["Invalid upload."]
+    assert not Bird.objects.filter(species="Borrowed robin").exists()
+
+
+def test_direct_upload_is_ingested(client, s3, users):
+    client.force_login(users[0])
+    post = presign(client).json()
+    key = post["fields"]["key"].removeprefix("media/")
+    staged = stage(s3, jpeg_bytes(), key)
+    response = client.post(
+        reverse("add_bird"),
+        {
+            "species": "Staged robin",
+            "location": "Here",
+            "photographer_comment": "Straight to the bucket",
+            "upload": post["upload"],
+        },
+    )
+
+    assert response.status_code == 302
+    bird = Bird.objects.get(species="Staged robin")
+    assert bird.picture.name == staged
+    ImageJob.objects.get(bird=bird).run()
+    bird.refresh_from_db()
+    assert not is_staged(bird.picture.name)
+    assert s3.is_hashed_name(bird.picture.name)
+    assert s3.exists(bird.picture.name)
+    assert not s3.exists(staged)
+    assert bird.renditions
+    assert bird.picture_status == Bird.PictureStatus.READY
+
+
+@pytest.mark.parametrize(
+    "name, staged", [(f"{STAGING_DIR}/a.jpg", True), ("bird/ab/a.jpg", False)]
+)
+def test_is_staged(name, staged):
+    assert is_staged(name) is staged
+
+
+def test_ingest_upload_moves_the_picture(s3):
+    name = stage(s3, jpeg_bytes())
+    moved = ingest_upload(name, s3, "bird")
+
+    assert moved.startswith("bird/")
+    assert s3.exists(moved)
+    assert not s3.exists(name)
+    # the same picture uploaded again is not stored twice
+    assert ingest_upload(stage(s3, jpeg_bytes()), s3, "bird") == moved
+    assert [o.key for o in s3.bucket.objects.all()] == [f"media/{moved}"]
+
+
+@pytest.mark.parametrize(
+    "data, error",
+    [(b"%PDF-1.4 not a picture", "Not a picture."), (None, "File too large.")],
+)
+def test_ingest_upload_rejects(s3, monkeypatch, data, error):
+    if data is None:
+        # a picture bigger than the limit, as the policy may be bypassed
+        monkeypatch.setattr("birds.uploads.MAX_PICTURE_SIZE", 100)
+        data = jpeg_bytes()
+    name = stage(s3, data)
+
+    with pytest.raises(ValidationError) as raised:
+        ingest_upload(name, s3, "bird")
+    assert raised.value.messages == [error]
+    assert not s3.exists(name)
@@ -0,0 +1,246 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from birds.forms import ModerationForm
+from birds.models import Bird, Comment, PendingModeration, Reply
+from pages.views import BirdUpdateView
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def bird():
+    return Bird.objects.order_by(
+        "-approved_comment_count",
+        "-seed_count",
+        "pk",
+    ).first()
+
+
+def test_bird_update_keeps_changes_made_meanwhile(client, bird, monkeypatch):
+    """
+    A seed, an approval or a finished image job landing while the bird is
+    being edited is not undone by the edit.
+    """
+    renditions = {"320": {"jpeg": "bird/aa/meanwhile.jpg"}}
+    get_object = BirdUpdateView.get_object
+
+    def get_object_then_change(self, queryset=None):
+        loaded = get_object(self, queryset)
+        Bird.objects.filter(pk=loaded.pk).adjust_counters(
+            seeds=1,
+            approved_comments=1,
+        )
+        Bird.objects.filter(pk=loaded.pk).update(
+            renditions=renditions, picture_status=Bird.PictureStatus.READY
+        )
+        return loaded
+
+    monkeypatch.setattr(BirdUpdateView, "get_object", get_object_then_change)
+    client.force_login(bird.photographer)
+    response = client.post(
+        reverse("bird_update", kwargs={"pk": bird.pk}),
+        {
+            "species": "Edited robin",
+            "location": bird.location,
+            "photographer_comment": bird.photographer_comment,
+        },
+    )
+
+    assert response.status_code == 302
+    edited = Bird.objects.get(pk=bird.pk)
+    assert edited.species == "Edited robin"
+    assert edited.seed_count == bird.seed_count + 1
+    assert edited.approved_comment_count == bird.approved_comment_count + 1
+    assert edited.renditions == renditions
+    assert edited.picture_status == Bird.PictureStatus.READY
+
+
+def thread_bird(photographer, visitor, comments, replies):
+    """
+    A new bird (no cached fragments yet) with approved comments and
+    replies, and a pending comment and reply of the visitor.
+    """
+    seeded = Bird.objects.exclude(renditions={}).first()
+    bird = Bird.objects.create(
+        species="Threaded robin",
+        picture=seeded.picture.name,
+        renditions=seeded.renditions,
+        picture_status=Bird.PictureStatus.READY,
+        photographer=photographer,
+    )
+    for number in range(comments):
+        comment = Comment.objects.create(
+            bird=bird,
+            comment=f"Comment {number}",
+            comment_approved=True,
+            comment_creator=photographer,
+        )
+        Reply.objects.bulk_create(
+            Reply(
+                comment=comment,
+                reply=f"Reply {number}.{reply}",
+                reply_approved=True,
+                reply_creator=visitor,
+            )
+            for reply in range(replies)
+        )
+    Comment.objects.create(
+        bird=bird, comment="Pending comment", comment_creator=visitor
+    )
+    Reply.objects.create(
+        comment=comment,
+        reply="Pending reply",
+        reply_creator=visitor,
+    )
+    return bird
+
+
+def test_bird_detail_queries_do_not_grow_with_the_thread(
+    client, django_assert_num_queries
+):
+    photographer, visitor = get_user_model().objects.order_by("username")[:2]
+    small = thread_bird(photographer, visitor, comments=1, replies=0)
+    large = thread_bird(photographer, visitor, comments=12, replies=3)
+    client.force_login(visitor)
+    client.get(reverse("home"))  # the session is loaded the same way below
+
+    with CaptureQueriesContext(connection) as one_comment:
+        response = client.get(reverse("bird_detail", kwargs={"pk": small.pk}))
+    assert response.status_code == 200
+
+    with django_assert_num_queries(len(one_comment)):
+        response = client.get(reverse("bird_detail", kwargs={"pk": large.pk}))
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert "Comment 11" in content
+    assert "Reply 11.2" in content
+    assert "Pending comment" in content
+    assert "Pending reply" in content
+
+
+def moderated_thread(username):
+    """
+    A bird of a new photographer with a comment and a reply of another
+    user waiting in the photographer's inbox.
+    """
+    photographer = get_user_model().objects.create_user(username)
+    visitor = get_user_model().objects.exclude(pk=photographer.pk).first()
+    bird = thread_bird(photographer, visitor, comments=1, replies=0)
+    comment = Comment.objects.get(bird=bird, comment_approved=False)
+    reply = Reply.objects.get(comment__bird=bird, reply_approved=False)
+    PendingModeration.objects.add(comment)
+    PendingModeration.objects.add(reply)
+    return comment, reply
+
+
+def test_moderation_queue_lists_only_own_birds(client):
+    own = moderated_thread("moderating-photographer")
+    foreign = moderated_thread("other-photographer")
+    client.force_login(own[0].bird.photographer)
+
+    response = client.get(reverse("moderation_queue"))
+
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert all(str(item.pk) in content for item in own)
+    assert not any(str(item.pk) in content for item in foreign)
+
+
+@pytest.mark.parametrize(
+    "action",
+    [ModerationForm.APPROVE, ModerationForm.DELETE],
+)
+def test_moderation_queue_batch(client, action):
+    comment, reply = moderated_thread("moderating-photographer")
+    foreign_comment, foreign_reply = moderated_thread("other-photographer")
+    bird, foreign_bird = comment.bird, foreign_comment.bird
+    client.force_login(bird.photographer)
+
+    response = client.post(
+        reverse("moderation_queue"),
+        {
+            "action": action,
+            # the ids of someone else's are ignored
+            "comments": [comment.pk, foreign_comment.pk],
+            "replies": [reply.pk, foreign_reply.pk],
+        },
+    )
+
+    assert response.status_code == 302
+    approved = action == ModerationForm.APPROVE
+    comments = Comment.objects.filter(pk=comment.pk, comment_approved=True)
+    replies = Reply.objects.filter(pk=reply.pk, reply_approved=True)
+    assert comments.exists() == approved
+    assert replies.exists() == approved
+    assert not Comment.objects.filter(pk=comment.pk, comment_approved=False)
+    assert not Reply.objects.filter(pk=reply.pk, reply_approved=False)
+    counted = Bird.objects.get(pk=bird.pk).approved_comment_count
+    assert counted == bird.approved_comment_count + approved
+    assert not PendingModeration.objects.filter(photographer=bird.photographer)
+    bird.photographer.refresh_from_db()
+    assert bird.photographer.pending_moderation_count == 0
+
+    assert Comment.objects.filter(pk=foreign_comment.pk).approve() == 1
+    assert Reply.objects.filter(pk=foreign_reply.pk).approve() == 1
+    counted = Bird.objects.get(pk=foreign_bird.pk).approved_comment_count
+    assert counted == foreign_bird.approved_comment_count + 1
+    foreign_bird.photographer.refresh_from_db()
+    assert foreign_bird.photographer.pending_moderation_count == 0
+
+
+def test_comment_and_reply_controls_check_the_ownership(client):
+    comment, reply = moderated_thread("moderating-photographer")
+    photographer = comment.bird.photographer
+    stranger = get_user_model().objects.create_user("stranger")
+    client.force_login(stranger)
+
+    for name, item in [
+        ("comment_approved", comment),
+        ("comment_removed", comment),
+        ("comment_edit", comment),
+        ("reply_approved", reply),
+        ("reply_removed", reply),
+        ("reply_edit", reply),
+    ]:
+        response = client.get(reverse(name, kwargs={"pk": item.pk}))
+        assert response.status_code == 404, name
+    assert Comment.objects.filter(pk=comment.pk, comment_approved=False)
+    assert Reply.objects.filter(pk=reply.pk, reply_approved=False)
+
+    client.force_login(reply.reply_creator)
+    response = client.get(reverse("reply_edit", kwargs={"pk": reply.pk}))
+    assert response.status_code == 200
+    client.force_login(photographer)
+    url = reverse("reply_removed", kwargs={"pk": reply.pk})
+    assert client.get(url).status_code == 302
+    assert not Reply.objects.filter(pk=reply.pk)
+    client.force_login(comment.comment_creator)
+    url = reverse("comment_removed", kwargs={"pk": comment.pk})
+    assert client.get(url).status_code == 302
+    assert not Comment.objects.filter(pk=comment.pk)
+
+
+@pytest.mark.parametrize(
+    "comment, error",
+    [
+        ("", "This field is required."),
+        ("Too long. " * 61, "Ensure this value has at most 600 characters"),
+    ],
+)
+def test_invalid_comment_shows_its_errors(client, bird, comment, error):
+    client.force_login(bird.photographer)
+
+    response = client.post(
+        reverse("bird_detail", kwargs={"pk": bird.pk}),
+        {"comment": comment},
+    )
+
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert error in content
+    assert comment.strip() in content
+    assert not Comment.objects.filter(bird=bird, comment=comment)
@@ -0,0 +1,95 @@
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+from .utils import MAX_PICTURE_SIZE
+
+# pictures uploaded straight to the bucket wait here until the image worker
+# has checked them, a lifecycle rule on the prefix removes the abandoned ones
+STAGING_DIR = "uploads"
+
+# content type announced by the browser -> extension of the staged object
+PICTURE_CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+# what Pillow must find in the staged object (MPO: JPEG from some cameras)
+PICTURE_FORMATS = {"JPEG", "MPO", "PNG", "WEBP", "GIF"}
+
+UPLOAD_SALT = "birds.uploads"
+
+# how long the presigned POST and the token of the staged key stay valid
+UPLOAD_EXPIRES = 15 * 60
+
+
+def staging_name(content_type):
+    return posixpath.join(
+        STAGING_DIR, uuid.uuid4().hex + PICTURE_CONTENT_TYPES[content_type]
+    )
+
+
+def is_staged(name):
+    return name.startswith(STAGING_DIR + "/")
+
+
+def sign_upload(user, name):
+    """
+    Token sent back with the form, it proves the staged key was handed out
+    to this user (keys cannot be guessed or borrowed from someone else).
+    """
+    upload = {"name": name, "user": str(user.pk)}
+    return signing.dumps(upload, salt=UPLOAD_SALT)
+
+
+def unsign_upload(user, token):
+    try:
+        upload = signing.loads(token, salt=UPLOAD_SALT, max_age=UPLOAD_EXPIRES)
+    except signing.BadSignature:
+        raise ValidationError(
+            "The upload expired, please pick the picture again.",
+        )
+    if upload["user"] != str(user.pk) or not is_staged(upload["name"]):
+        raise ValidationError("Invalid upload.")
+    return upload["name"]
+
+
+def direct_uploads_enabled():
+    if not settings.DIRECT_UPLOADS:
+        return False
+    return hasattr(default_storage, "presigned_post")
+
+
+def ingest_upload(name, storage, upload_to):
+    """
+    Checks a staged upload (the bytes never went through Django: the size
+    and the type announced by the browser cannot be trusted) and moves it
+    to upload_to. Returns the new storage name, raises ValidationError for
+    a picture to reject, the staged object is removed then too.
+    """
+    try:
+        if storage.size(name) > MAX_PICTURE_SIZE:
+            raise ValidationError("File too large.")
+        with storage.open(name, "rb") as content:
+            try:
+                image_format = Image.open(content).format
+            except UnidentifiedImageError:
+                image_format = None
+            if image_format not in PICTURE_FORMATS:
+                raise ValidationError("Not a picture.")
+            content.seek(0)
+            moved = storage.save(
+                posixpath.join(upload_to, posixpath.basename(name)), content
+            )
+    except ValidationError:
+        storage.delete(name)
+        raise
+    storage.delete(name)
+    return moved
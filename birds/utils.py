@@ -24,10 +24,13 @@ def compress_image(file):
     return image
 
 
+# biggest picture accepted, checked on form uploads and on direct uploads
+MAX_PICTURE_SIZE = 5242880  # 5 megabytes
+
+
 def file_size(value):
     """
     limits the size of file that can be uploaded by user
     """
-    limit = 5242880  # 5 megabytes
-    if value.size > limit:
+    if value.size > MAX_PICTURE_SIZE:
         raise ValidationError("File too large. Size should not exceed 2 MiB")
@@ -0,0 +1,30 @@
+#!/bin/sh
+# Container entrypoint, the command picks the process to run:
+#   web      gunicorn (gunicorn.conf.py), the default
+#   asgi     uvicorn with the async views (ASYNC_VIEWS=True)
+#   worker   the image worker
+#   migrate  applies the migrations and exits, run it once per release
+#            before starting the new web containers
+# anything else is executed as is (e.g. python manage.py shell).
+set -e
+
+case "$1" in
+    web)
+        exec gunicorn whistly.wsgi
+        ;;
+    asgi)
+        export ASYNC_VIEWS=True
+        exec uvicorn whistly.asgi:application --host 0.0.0.0 \
+            --port "${PORT:-8000}" --workers "${WEB_CONCURRENCY:-2}" \
+            --timeout-keep-alive 5
+        ;;
+    worker)
+        exec python manage.py run_image_worker
+        ;;
+    migrate)
+        exec python manage.py migrate --noinput
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
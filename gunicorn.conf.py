@@ -0,0 +1,65 @@
+"""
+gunicorn settings, read from the working directory by `gunicorn whistly.wsgi`
+(docker-entrypoint.sh web). Every value can be overridden from the
+environment, e.g. WEB_CONCURRENCY=4 GUNICORN_THREADS=8.
+"""
+
+import math
+import os
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+
+def available_cpus():
+    """
+    CPUs this container may use: the CPUs it may be scheduled on, capped by
+    the cgroup v2 quota (docker --cpus, Kubernetes limits).
+    cpu_count() would count every CPU of the host.
+    """
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as cpu_max:
+            quota, period = cpu_max.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, math.ceil(int(quota) / int(period))))
+
+
+# processes for the CPU bound part (templates, Pillow), threads to overlap the
+# waits on PostgreSQL, S3 and the cache within each process.
+# Every thread keeps its own database connection open (CONN_MAX_AGE), so a
+# container holds up to workers x threads connections: with several
+# containers their sum must stay under the max_connections of PostgreSQL
+# (100 by default, a few are reserved), or use DATABASE_POOL to cap them per
+# process.
+workers = env_int("WEB_CONCURRENCY", available_cpus() + 1)
+threads = env_int("GUNICORN_THREADS", 4)
+worker_class = "gthread" if threads > 1 else "sync"
+
+# keep the connections of the load balancer open between requests
+keepalive = env_int("GUNICORN_KEEPALIVE", 5)
+timeout = env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+
+# recycle the workers now and then (memory growth), not all at once
+max_requests = env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Django is imported once in the master and the workers are forked from it:
+# faster (re)starts and shared memory pages. No connection is opened at import
+# time, every worker opens its own.
+preload_app = True
+
+# the heartbeat files of the workers, /tmp may be a slow disk in containers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
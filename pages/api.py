@@ -0,0 +1,514 @@
+"""
+Read-only JSON API under /api/v1/, for the mobile client and partners:
+the birds (filtered and ordered like the search page), their approved
+comments and replies and their seeds. Like the search and bird pages it
+needs a logged in user (the session cookie).
+
+- Lists are cursor paginated (birds/pagination.py), links.next and
+  links.previous carry the cursor. ?page_size= goes up to MAX_PAGE_SIZE.
+- ?fields=species,location,comments.comment picks the fields, dotted for
+  the included rows. The columns of the other fields are not loaded.
+- ?include=comments,comments.replies,seeds nests related rows: one query
+  per relation whatever the page size, at most INCLUDED_ROWS per parent
+  (the rest is paged from their own endpoint).
+- Responses carry an ETag, If-None-Match is answered with 304. A bird and
+  its comments and seeds use the bird's cache version (birds/cache.py), so
+  the 304 is sent without loading any of them.
+- Bodies are compressed with brotli when the brotli package is installed
+  and the client accepts it, with gzip otherwise.
+"""
+
+import hashlib
+import re
+from abc import ABCMeta, abstractmethod
+from operator import attrgetter
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+from django.core.paginator import InvalidPage
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.text import compress_string
+from django.views import View
+
+from birds.cache import VERSION_KEY, bird_versions
+from birds.models import Bird, Comment, Reply, Seed
+from birds.pagination import CursorPaginator
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# rows nested under each parent by ?include=
+INCLUDED_ROWS = 10
+
+# smaller bodies are sent as they are
+MIN_COMPRESS_SIZE = 200
+
+# fast enough for bodies built on every request, still smaller than gzip
+BROTLI_QUALITY = 5
+
+BROTLI_RE = re.compile(r"\bbr\b")
+GZIP_RE = re.compile(r"\bgzip\b")
+
+
+def api_field(*columns, getter=None):
+    """
+    A field of a resource: the columns only() must load for it (related
+    ones are select_related) and how its value is read, the attribute of
+    the same name by default.
+    """
+    return columns, getter
+
+
+class Include:
+    """
+    A relation ?include= can nest: the prefetch lookup, the attribute the
+    rows end up in, the rows that may be included (ordered) and the column
+    pointing at the parent.
+    """
+
+    def __init__(self, lookup, to_attr, resource, queryset, parent_column):
+        self.lookup = lookup
+        self.to_attr = to_attr
+        self.resource = resource
+        self.queryset = queryset
+        self.parent_column = parent_column
+
+
+class Resource:
+    def __init__(self, fields, includes=None):
+        self.fields = fields
+        self.includes = includes or {}
+
+    def value(self, row, name):
+        columns, getter = self.fields[name]
+        return getter(row) if getter else getattr(row, name)
+
+
+def rendition_urls(bird):
+    storage = bird.picture.storage
+    return {
+        width: {key: storage.url(name) for key, name in formats.items()}
+        for width, formats in bird.renditions.items()
+    }
+
+
+REPLY = Resource(
+    fields={
+        "id": api_field("id"),
+        "reply": api_field("reply"),
+        "creator": api_field(
+            "reply_creator",
+            "reply_creator__username",
+            getter=lambda reply: reply.reply_creator.username,
+        ),
+        "creator_id": api_field(
+            "reply_creator",
+            getter=attrgetter("reply_creator_id"),
+        ),
+        "created": api_field("created"),
+        "modified": api_field("modified"),
+    }
+)
+
+COMMENT = Resource(
+    fields={
+        "id": api_field("id"),
+        "comment": api_field("comment"),
+        "creator": api_field(
+            "comment_creator",
+            "comment_creator__username",
+            getter=lambda comment: comment.comment_creator.username,
+        ),
+        "creator_id": api_field(
+            "comment_creator", getter=attrgetter("comment_creator_id")
+        ),
+        "created": api_field("created"),
+        "modified": api_field("modified"),
+    },
+    includes={
+        "replies": Include(
+            lookup="replies",
+            to_attr="api_replies",
+            resource=REPLY,
+            queryset=lambda: Reply.objects.filter(
+                reply_approved=True,
+            ).order_by("created"),
+            parent_column="comment",
+        ),
+    },
+)
+
+SEED = Resource(
+    fields={
+        "seeder": api_field(
+            "seeder",
+            "seeder__username",
+            getter=lambda seed: seed.seeder.username,
+        ),
+        "seeder_id": api_field("seeder", getter=attrgetter("seeder_id")),
+    }
+)
+
+BIRD = Resource(
+    fields={
+        "id": api_field("id"),
+        "species": api_field("species"),
+        "location": api_field("location"),
+        "photographer": api_field(
+            "photographer",
+            "photographer__username",
+            getter=lambda bird: bird.photographer.username,
+        ),
+        "photographer_id": api_field(
+            "photographer", getter=attrgetter("photographer_id")
+        ),
+        "photographer_comment": api_field("photographer_comment"),
+        "picture": api_field("picture", getter=lambda bird: bird.picture.url),
+        "renditions": api_field(
+            "picture",
+            "renditions",
+            getter=rendition_urls,
+        ),
+        "picture_status": api_field("picture_status"),
+        "seed_count": api_field("seed_count"),
+        "approved_comment_count": api_field("approved_comment_count"),
+        "created": api_field("created"),
+        "modified": api_field("modified"),
+    },
+    includes={
+        "comments": Include(
+            lookup="comments",
+            to_attr="api_comments",
+            resource=COMMENT,
+            queryset=lambda: Comment.objects.filter(
+                comment_approved=True,
+            ).order_by("-created"),
+            parent_column="bird",
+        ),
+        "seeds": Include(
+            lookup="seeds",
+            to_attr="api_seeds",
+            resource=SEED,
+            queryset=lambda: Seed.objects.order_by("seeder__username"),
+            parent_column="bird",
+        ),
+    },
+)
+
+
+def split_param(value):
+    return [part for part in (value or "").replace(" ", "").split(",") if part]
+
+
+class Selection:
+    """
+    What ?fields= and ?include= ask of a resource, and of each included one.
+    """
+
+    def __init__(self, resource):
+        self.resource = resource
+        self.fields = []  # empty: all of them
+        self.includes = {}
+
+    @classmethod
+    def from_request(cls, resource, request):
+        selection = cls(resource)
+        for path in split_param(request.GET.get("include")):
+            current = selection
+            for name in path.split("."):
+                if name not in current.resource.includes:
+                    raise BadRequest(f"Unknown include: {path}.")
+                if name not in current.includes:
+                    included = current.resource.includes[name].resource
+                    current.includes[name] = cls(included)
+                current = current.includes[name]
+        for path in split_param(request.GET.get("fields")):
+            *names, name = path.split(".")
+            current = selection
+            for included in names:
+                if included not in current.includes:
+                    raise BadRequest(f"{path}: {included} is not included.")
+                current = current.includes[included]
+            if name not in current.resource.fields:
+                raise BadRequest(f"Unknown field: {path}.")
+            if name not in current.fields:
+                current.fields.append(name)
+        return selection
+
+    @property
+    def field_names(self):
+        return self.fields or list(self.resource.fields)
+
+    def restrict(self, queryset, *columns):
+        """
+        Loads only the columns of the selected fields (and the given ones,
+        the ordering or the foreign key to the parent), with the related
+        rows they need in the same query and the included rows prefetched.
+        """
+        columns = {"pk", *columns}
+        for name in self.field_names:
+            columns.update(self.resource.fields[name][0])
+        related = {name.split("__")[0] for name in columns if "__" in name}
+        columns.update(related)
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns).prefetch_related(*self.prefetches())
+
+    def prefetches(self, prefix=""):
+        for name, selection in self.includes.items():
+            include = self.resource.includes[name]
+            queryset = selection.restrict(
+                include.queryset(),
+                include.parent_column,
+            )
+            yield Prefetch(
+                prefix + include.lookup,
+                # sliced per parent with a window function
+                queryset=queryset[:INCLUDED_ROWS],
+                to_attr=include.to_attr,
+            )
+            yield from selection.prefetches(prefix=f"{include.to_attr}__")
+
+    def serialize(self, row):
+        value = self.resource.value
+        data = {name: value(row, name) for name in self.field_names}
+        for name, selection in self.includes.items():
+            included = getattr(row, self.resource.includes[name].to_attr)
+            data[name] = [selection.serialize(child) for child in included]
+        return data
+
+
+def compress(request, response):
+    """
+    Compresses the body for the client: brotli, gzip or nothing. The ETag
+    is made weak as the bytes differ from one encoding to the other.
+    """
+    patch_vary_headers(response, ("Accept-Encoding",))
+    if len(response.content) < MIN_COMPRESS_SIZE:
+        return response
+    accept_encoding = request.headers.get("Accept-Encoding", "")
+    if brotli is not None and BROTLI_RE.search(accept_encoding):
+        content = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        encoding = "br"
+    elif GZIP_RE.search(accept_encoding):
+        content = compress_string(response.content)
+        encoding = "gzip"
+    else:
+        return response
+    if len(content) >= len(response.content):
+        return response
+    response.content = content
+    response["Content-Length"] = str(len(content))
+    response["Content-Encoding"] = encoding
+    if response.has_header("ETag"):
+        response["ETag"] = re.sub(r'^"', 'W/"', response["ETag"])
+    return response
+
+
+class ApiView(LoginRequiredMixin, View, metaclass=ABCMeta):
+    """
+    GET only, for logged in users like the HTML views it mirrors (a 401
+    instead of the redirect to the login page). Errors as
+    {"error": message}, conditional and compressed responses. Subclasses
+    set resource and implement get_data().
+    """
+
+    http_method_names = ["get", "head", "options"]
+    resource = None
+
+    def handle_no_permission(self):
+        return JsonResponse({"error": "Authentication required."}, status=401)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            etag = self.get_etag()
+            if etag:
+                response = get_conditional_response(request, etag=etag)
+                if response is not None:
+                    response["ETag"] = etag
+                    patch_vary_headers(response, ("Accept-Encoding",))
+                    return response
+            self.selection = Selection.from_request(self.resource, request)
+            data = self.get_data()
+        except BadRequest as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        except Http404 as error:
+            return JsonResponse({"error": str(error)}, status=404)
+        dumps_params = {"separators": (",", ":")}
+        response = JsonResponse(data, json_dumps_params=dumps_params)
+        if etag is None:
+            # validated after the fact: saves the transfer, not the queries
+            etag = self.get_etag(found=True)
+            if not etag:
+                digest = hashlib.md5(response.content, usedforsecurity=False)
+                etag = f'"{digest.hexdigest()}"'
+            conditional = get_conditional_response(request, etag=etag)
+            if conditional is not None:
+                response = conditional
+        response["ETag"] = etag
+        if response.status_code == 200:
+            return compress(request, response)
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    def get_etag(self, found=False):
+        """
+        An ETag known before the data is loaded, None to hash the body.
+        When it was None, it is asked again with found=True once the data
+        was loaded without a 404.
+        """
+        return None
+
+    @abstractmethod
+    def get_data(self):
+        """
+        The response body, raising BadRequest or Http404.
+        """
+
+    def bird_etag(self, found=False):
+        """
+        The version changes with anything shown on the bird's page. It is
+        only read from the cache until the bird was found: a version is
+        created for existing birds only, not for any pk a client makes up.
+        """
+        pk = self.kwargs["pk"]
+        if found:
+            version = bird_versions([pk])[pk]
+        else:
+            version = cache.get(VERSION_KEY.format(pk))
+            if version is None:
+                return None
+        key = f"{self.request.get_full_path()}:{version}"
+        return '"{}"'.format(
+            hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+        )
+
+    def get_page_size(self):
+        try:
+            page_size = self.request.GET.get("page_size", DEFAULT_PAGE_SIZE)
+            page_size = int(page_size)
+        except ValueError:
+            raise BadRequest("page_size must be a number.")
+        if not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise BadRequest(
+                f"page_size must be between 1 and {MAX_PAGE_SIZE}.",
+            )
+        return page_size
+
+    def paginate(self, queryset, *columns):
+        """
+        A page of queryset in the cursor order, with the links to the pages
+        around it.
+        """
+        ordering = CursorPaginator.get_ordering(queryset)
+        annotations = queryset.query.annotations
+        columns = [
+            *columns,
+            *(name.lstrip("-") for name in ordering),
+        ]
+        queryset = self.selection.restrict(
+            queryset,
+            *(column for column in columns if column not in annotations),
+        )
+        paginator = CursorPaginator(queryset, self.get_page_size())
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidPage as error:
+            raise BadRequest(str(error))
+        return {
+            "data": [self.selection.serialize(row) for row in page],
+            "links": {
+                "next": self.page_link(page.next_cursor),
+                "previous": self.page_link(page.previous_cursor),
+            },
+        }, page
+
+    def page_link(self, cursor):
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query["cursor"] = cursor
+        return self.request.build_absolute_uri(
+            f"{self.request.path}?{query.urlencode()}"
+        )
+
+
+class BirdListApiView(ApiView):
+    """
+    /api/v1/birds/?q=&order_by=, the queries of the search page.
+    """
+
+    resource = BIRD
+
+    def get_data(self):
+        queryset = Bird.objects.search_results(
+            self.request.GET.get("q"), self.request.GET.get("order_by")
+        )
+        return self.paginate(queryset)[0]
+
+
+class BirdApiView(ApiView):
+    resource = BIRD
+
+    def get_etag(self, found=False):
+        return self.bird_etag(found)
+
+    def get_data(self):
+        queryset = self.selection.restrict(
+            Bird.objects.filter(pk=self.kwargs["pk"]),
+        )
+        bird = queryset.first()
+        if bird is None:
+            raise Http404("No bird found matching the query")
+        return {"data": self.selection.serialize(bird)}
+
+
+class BirdRelationApiView(ApiView):
+    """
+    The rows of a bird that ?include= only nests up to INCLUDED_ROWS of.
+    """
+
+    def get_etag(self, found=False):
+        return self.bird_etag(found)
+
+    @abstractmethod
+    def get_queryset(self):
+        """
+        The bird's rows, in the cursor order.
+        """
+
+    def get_data(self):
+        data, page = self.paginate(self.get_queryset(), "bird")
+        if (
+            not page.object_list
+            and not Bird.objects.filter(pk=self.kwargs["pk"]).exists()
+        ):
+            raise Http404("No bird found matching the query")
+        return data
+
+
+class BirdCommentsApiView(BirdRelationApiView):
+    resource = COMMENT
+
+    def get_queryset(self):
+        # newest first, the (bird, comment_approved, -created) index
+        return Comment.objects.filter(
+            bird=self.kwargs["pk"],
+            comment_approved=True,
+        )
+
+
+class BirdSeedsApiView(BirdRelationApiView):
+    resource = SEED
+
+    def get_queryset(self):
+        return Seed.objects.filter(bird=self.kwargs["pk"])
@@ -0,0 +1,154 @@
+"""
+Async versions of the read-only views, routed instead of the sync ones when
+settings.ASYNC_VIEWS is on and meant to be served by an ASGI server
+(whistly/asgi.py). They reuse the querysets and contexts of pages/views.py
+and only fetch their rows with the async ORM, the templates are rendered by
+Django in a thread (anything they load lazily is still allowed there).
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+
+from birds.cache import aattach_cache_versions
+
+from .media import media_response, open_media, read_range
+from .views import (
+    BirdDetailSimpleView,
+    BirdDetailView,
+    BirdsNestListView,
+    ProfileDetailView,
+    SearchResultsListView,
+)
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """
+    LoginRequiredMixin for async views. request.user would load the session
+    and the user from the event loop, request.auser() loads them in a
+    thread and request.user is replaced by the result so the templates do
+    not load them a second time.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        dispatch = super(LoginRequiredMixin, self).dispatch
+        return await dispatch(request, *args, **kwargs)
+
+
+class AsyncCursorListMixin:
+    """
+    get() of a cursor paginated ListView: the page is fetched with
+    apaginate_queryset() and handed to get_context_data().
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.pagination = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        await self.aprepare_page(self.pagination[2])
+        context = self.get_context_data()
+        return self.render_to_response(context)
+
+    async def aprepare_page(self, object_list):
+        """
+        Loads what the template needs besides the rows of the page.
+        """
+
+    def paginate_queryset(self, queryset, page_size):
+        # already fetched by get()
+        return self.pagination
+
+
+class AsyncBirdsNestListView(AsyncCursorListMixin, BirdsNestListView):
+
+    async def aprepare_page(self, object_list):
+        await aattach_cache_versions(object_list)
+
+    def get_context_data(self, **kwargs):
+        # the cache versions are attached by aprepare_page()
+        return super(BirdsNestListView, self).get_context_data(**kwargs)
+
+
+class AsyncSearchResultsListView(
+    AsyncLoginRequiredMixin, AsyncCursorListMixin, SearchResultsListView
+):
+    pass
+
+
+class AsyncProfileDetailView(
+    AsyncLoginRequiredMixin, AsyncCursorListMixin, ProfileDetailView
+):
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            get_user_model(),
+            pk=kwargs["pk"],
+        )
+        return await super().get(request, *args, **kwargs)
+
+
+class AsyncBirdDetailView(AsyncLoginRequiredMixin, BirdDetailView):
+
+    async def get(self, request, *args, **kwargs):
+        bird = await aget_object_or_404(self.get_queryset(), pk=kwargs["pk"])
+        await bird.aload_pending(request.user)
+        self.object = (await aattach_cache_versions([bird]))[0]
+        context = self.get_context_data(object=self.object)
+        return self.render_to_response(context)
+
+
+class AsyncBirdDetailSimpleView(AsyncLoginRequiredMixin, View):
+    """
+    The bird page. Only reading it is async, the rotations (GET ?name=) and
+    the comment/reply forms (POST) are the sync views, run in a thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if request.GET.get("name", False):
+            view = sync_to_async(BirdDetailSimpleView.as_view())
+        else:
+            view = AsyncBirdDetailView.as_view()
+        return await view(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(BirdDetailSimpleView.as_view())
+        return await view(request, *args, **kwargs)
+
+
+async def serve_media(request, path):
+    """
+    Async view of the local media (pages/media.py), the file is streamed
+    chunk by chunk and every read runs in a worker thread, so neither a
+    slow storage nor a slow client keeps the event loop or a thread busy
+    for the whole download (django.views.static.serve iterates a file
+    synchronously, under ASGI that means reading all of it into memory
+    first).
+    """
+    respond = sync_to_async(media_response, thread_sensitive=False)
+    head, byte_range = await respond(request, path)
+    if head.status_code not in (200, 206) or request.method == "HEAD":
+        return head
+    media = await sync_to_async(open_media, thread_sensitive=False)(path)
+    # read_range() run one step at a time in a thread
+    reader = read_range(media, *(byte_range or ()))
+
+    async def chunks():
+        try:
+            while chunk := await sync_to_async(next, thread_sensitive=False)(
+                reader, None
+            ):
+                yield chunk
+        finally:
+            await sync_to_async(reader.close, thread_sensitive=False)()
+
+    response = StreamingHttpResponse(chunks(), status=head.status_code)
+    for header, value in head.items():
+        response[header] = value
+    return response
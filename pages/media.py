@@ -0,0 +1,177 @@
+"""
+Serving of the local media storage (MEDIA_URL on the site itself) instead
+of django.views.static.serve: conditional requests (ETag, Last-Modified),
+single byte ranges and cache headers. Content-addressed files never change
+under their name and are cached for a year, the others are revalidated.
+The staged direct uploads (birds/uploads.py) are not served, they have not
+been checked yet. serve_media is the sync view, pages/async_views.py has the
+async one.
+"""
+
+import mimetypes
+import posixpath
+import re
+
+from django.core.files.storage import default_storage
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from birds.uploads import STAGING_DIR, is_staged
+from whistly.content_storage import IMMUTABLE_CACHE_CONTROL
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:  # no S3 storage
+    ClientError = OSError
+
+# what a storage raises for a name it cannot find or open (a null byte in
+# the path is a ValueError)
+LOOKUP_ERRORS = (OSError, ValueError, ClientError)
+
+# bytes read from the storage at a time when streaming media
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single "bytes=" range, both included, or None for the
+    whole file (no header, several ranges or another unit).
+    """
+    match = RANGE_RE.match(header or "")
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # suffix range, the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if size == 0 or start > end or start >= size:
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def media_response(request, path, storage=default_storage):
+    """
+    Everything but the body: (response, byte range). The response is
+    complete (304, 412, 416) when the file must not be sent, otherwise its
+    headers are to be copied on the response streaming the file.
+    """
+    name = posixpath.normpath(path)
+    if name == STAGING_DIR or is_staged(name):
+        raise Http404("No media file found matching the path")
+    try:
+        size = storage.size(path)
+        modified = storage.get_modified_time(path)
+    except LOOKUP_ERRORS:
+        raise Http404("No media file found matching the path")
+
+    if getattr(storage, "is_hashed_name", lambda name: False)(path):
+        etag = '"{}"'.format(path.rsplit("/", 1)[-1].split(".", 1)[0])
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        etag = f'W/"{int(modified.timestamp())}-{size}"'
+        cache_control = "public, no-cache"
+    headers = {
+        "ETag": etag,
+        "Last-Modified": http_date(modified.timestamp()),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=int(modified.timestamp())
+    )
+    if conditional is not None:
+        for header, value in headers.items():
+            conditional[header] = value
+        return conditional, None
+
+    byte_range = None
+    # a range of an older version of the file would be stitched to the rest
+    if request.headers.get("If-Range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("Range"), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416, headers=headers)
+            response["Content-Range"] = f"bytes */{size}"
+            return response, None
+
+    content_type, encoding = mimetypes.guess_type(path)
+    response = HttpResponse(
+        content_type=content_type or "application/octet-stream",
+        headers=headers,
+    )
+    if byte_range:
+        start, end = byte_range
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    else:
+        response["Content-Length"] = str(size)
+    return response, byte_range
+
+
+def open_media(path, storage=default_storage):
+    try:
+        return storage.open(path, "rb")
+    except LOOKUP_ERRORS:
+        raise Http404("No media file found matching the path")
+
+
+def read_range(media, start=0, end=None):
+    """
+    Yields the bytes start..end of the file (end included, None: up to the
+    end of the file) and closes it.
+    """
+    remaining = None if end is None else end - start + 1
+    try:
+        media.seek(start)
+        while remaining is None or remaining > 0:
+            chunk = media.read(
+                MEDIA_CHUNK_SIZE
+                if remaining is None
+                else min(MEDIA_CHUNK_SIZE, remaining)
+            )
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        media.close()
+
+
+def serve_media(request, path):
+    """
+    Sync view of the local media. A whole file goes out as a FileResponse,
+    which gunicorn sends with sendfile() (wsgi.file_wrapper).
+    """
+    head, byte_range = media_response(request, path)
+    if head.status_code not in (200, 206) or request.method == "HEAD":
+        return head
+    media = open_media(path)
+    if byte_range:
+        chunks = read_range(media, *byte_range)
+        response = StreamingHttpResponse(chunks, status=206)
+    else:
+        response = FileResponse(media)
+    for header, value in head.items():
+        response[header] = value
+    return response
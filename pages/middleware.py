@@ -0,0 +1,109 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Max
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from birds.cache import FEED_KEY
+from birds.models import Bird
+
+# public pages whose content only changes with the birds
+CACHED_URL_NAMES = {"home", "birds_nest"}
+
+# a request carrying one of these may render user specific content
+PERSONAL_COOKIES = (settings.SESSION_COOKIE_NAME, "messages")
+
+
+def feed_last_modified():
+    """
+    When the public pages last changed: the newest Bird.modified, moved
+    forward by birds.cache.touch_feed() (that also covers deletions).
+    """
+    last_modified = cache.get(FEED_KEY)
+    if last_modified is None:
+        last_modified = Bird.objects.aggregate(last=Max("modified"))["last"]
+        last_modified = last_modified or timezone.now()
+        cache.add(FEED_KEY, last_modified, timeout=None)
+    return last_modified
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Full page cache of the home page and the bird feed for anonymous
+    visitors (settings.ANONYMOUS_PAGE_CACHE), placed before the session,
+    auth and allauth middleware so a hit skips all of them.
+
+    Responses carry an ETag and Last-Modified derived from the feed's last
+    change, conditional GETs are answered with 304 without rendering and a
+    new bird gives every page a new key (the old entries just expire).
+    Requests with a session are never cached.
+    """
+
+    def __init__(self, get_response):
+        # the debug toolbar would end up inside the cached pages
+        if not settings.ANONYMOUS_PAGE_CACHE or settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.timeout = settings.ANONYMOUS_PAGE_CACHE_TIMEOUT
+
+    def __call__(self, request):
+        if not self.is_cacheable(request):
+            return self.get_response(request)
+
+        last_modified = feed_last_modified()
+        path = request.get_full_path()
+        etag = hashlib.md5(
+            f"{path}:{last_modified.isoformat()}".encode(),
+            usedforsecurity=False,
+        ).hexdigest()
+        timestamp = int(last_modified.timestamp())
+
+        response = get_conditional_response(
+            request, etag=f'"{etag}"', last_modified=timestamp
+        )
+        if response is None:
+            key = f"anonymous-page:{etag}"
+            response = cache.get(key)
+            if response is None:
+                response = self.get_response(request)
+                if not self.is_storable(request, response):
+                    return response
+                self.set_validators(response, etag, timestamp)
+                cache.set(key, response, self.timeout)
+        else:
+            self.set_validators(response, etag, timestamp)
+        return response
+
+    @staticmethod
+    def set_validators(response, etag, timestamp):
+        response.headers["ETag"] = f'"{etag}"'
+        response.headers["Last-Modified"] = http_date(timestamp)
+        # may be stored, but has to be revalidated (a cheap 304) every time
+        patch_cache_control(response, no_cache=True)
+
+    @staticmethod
+    def is_cacheable(request):
+        if request.method not in ("GET", "HEAD"):
+            return False
+        if any(name in request.COOKIES for name in PERSONAL_COOKIES):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in CACHED_URL_NAMES
+
+    @staticmethod
+    def is_storable(request, response):
+        return (
+            request.method == "GET"
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not response.has_header("ETag")
+        )
@@ -1,5 +1,19 @@
+from django.conf import settings
 from django.urls import path
 
+from .api import (
+    BirdApiView,
+    BirdCommentsApiView,
+    BirdListApiView,
+    BirdSeedsApiView,
+)
+from .async_views import (
+    AsyncBirdDetailSimpleView,
+    AsyncBirdsNestListView,
+    AsyncProfileDetailView,
+    AsyncSearchResultsListView,
+)
+
 # func based views
 # class based views
 from .views import (
@@ -12,6 +26,8 @@ from .views import (
     EditCommentUpdateView,
     EditReplyUpdateView,
     HomeTemplateView,
+    ModerationQueueView,
+    PresignUploadView,
     ProfileDetailView,
     ProfileUpdateView,
     RemoveAccountDeleteView,
@@ -23,6 +39,18 @@ from .views import (
     remove_reply,
 )
 
+if settings.ASYNC_VIEWS:
+    # async read views, to be served by an ASGI server (whistly/asgi.py)
+    profile_detail_view = AsyncProfileDetailView.as_view()
+    birds_nest_view = AsyncBirdsNestListView.as_view()
+    bird_detail_view = AsyncBirdDetailSimpleView.as_view()
+    search_results_view = AsyncSearchResultsListView.as_view()
+else:
+    profile_detail_view = ProfileDetailView.as_view()
+    birds_nest_view = BirdsNestListView.as_view()
+    bird_detail_view = BirdDetailSimpleView.as_view()
+    search_results_view = SearchResultsListView.as_view()
+
 urlpatterns = [
     # basic urls
     path("", HomeTemplateView.as_view(), name="home"),
@@ -39,7 +67,7 @@ urlpatterns = [
     ),
     path(
         "user_profile/<uuid:pk>/",
-        ProfileDetailView.as_view(),
+        profile_detail_view,
         name="profile_detail",  # noqa: E501
     ),  # noqa: E501
     path(
@@ -49,10 +77,15 @@ urlpatterns = [
     ),
     # bird urls
     path("feathers_up/", AddBirdCreateView.as_view(), name="add_bird"),  # noqa: E501
-    path("birds_nest/", BirdsNestListView.as_view(), name="birds_nest"),  # noqa: E501
+    path(
+        "feathers_up/presign/",
+        PresignUploadView.as_view(),
+        name="presign_upload",
+    ),
+    path("birds_nest/", birds_nest_view, name="birds_nest"),
     path(
         "birds_nest/<uuid:pk>/",
-        BirdDetailSimpleView.as_view(),
+        bird_detail_view,
         name="bird_detail",  # noqa: E501
     ),  # noqa: E501
     path(
@@ -97,6 +130,11 @@ urlpatterns = [
         EditReplyUpdateView.as_view(),
         name="reply_edit",
     ),
+    path(
+        "moderation/",
+        ModerationQueueView.as_view(),
+        name="moderation_queue",
+    ),
     # seeds
     # path('birds_nest/<uuid:pk>/seed', add_remove_seed_function_view, name='seed'),  # noqa: E501
     path(
@@ -105,7 +143,18 @@ urlpatterns = [
         name="seed",  # noqa: E501
     ),  # noqa: E501
     # search
+    path("search/", search_results_view, name="search_results"),
+    # json api (pages/api.py)
+    path("api/v1/birds/", BirdListApiView.as_view(), name="api_birds"),
+    path("api/v1/birds/<uuid:pk>/", BirdApiView.as_view(), name="api_bird"),
     path(
-        "search/", SearchResultsListView.as_view(), name="search_results"
-    ),  # noqa: E501
+        "api/v1/birds/<uuid:pk>/comments/",
+        BirdCommentsApiView.as_view(),
+        name="api_bird_comments",
+    ),
+    path(
+        "api/v1/birds/<uuid:pk>/seeds/",
+        BirdSeedsApiView.as_view(),
+        name="api_bird_seeds",
+    ),
 ]
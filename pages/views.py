@@ -1,7 +1,11 @@
 from allauth.account.views import PasswordChangeView
 from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count, Q
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
 from django.views import View
@@ -9,8 +13,24 @@ from django.views.generic import DetailView, FormView, ListView, TemplateView
 from django.views.generic.detail import SingleObjectMixin
 from django.views.generic.edit import CreateView, DeleteView, UpdateView
 
-from birds.forms import AddBirdForm, CommentForm, ReplyForm
-from birds.models import Bird, Comment, Reply, Seed
+from birds.cache import attach_cache_versions
+from birds.forms import (
+    AddBirdForm,
+    CommentForm,
+    DirectUploadBirdForm,
+    ModerationForm,
+    ReplyForm,
+)
+from birds.models import Bird, Comment, PendingModeration, Reply, Seed
+from birds.pagination import CursorPaginationMixin
+from birds.uploads import (
+    PICTURE_CONTENT_TYPES,
+    UPLOAD_EXPIRES,
+    direct_uploads_enabled,
+    sign_upload,
+    staging_name,
+)
+from birds.utils import MAX_PICTURE_SIZE
 
 
 # Create your views here.
@@ -24,14 +44,47 @@ class RemoveAccountDeleteView(LoginRequiredMixin, DeleteView):
     template_name = "account/remove_account.html"
     success_url = reverse_lazy("home")
 
+    def form_valid(self, form):
+        """
+        The user's seeds and comments on other birds are deleted in cascade,
+        their counters are recomputed afterwards.
+        """
+        involved = Q(seeds__seeder=self.object)
+        involved |= Q(comments__comment_creator=self.object)
+        birds = Bird.objects.filter(involved)
+        bird_ids = set(birds.values_list("pk", flat=True))
+        with transaction.atomic():
+            response = super().form_valid(form)
+            Bird.objects.filter(pk__in=bird_ids).recount()
+        return response
+
 
 # Profiles related Views
 
 
-class ProfileDetailView(LoginRequiredMixin, DetailView):
-    model = get_user_model()
+class ProfileDetailView(
+    LoginRequiredMixin, CursorPaginationMixin, SingleObjectMixin, ListView
+):
+    """
+    The profile and one page of its gallery, the cost of the page does
+    not grow with the number of birds the user shared.
+    """
+
     template_name = "profile/profile_detail.html"
-    context_object_name = "profile"
+    paginate_by = 12
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object(queryset=get_user_model().objects.all())
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["profile"] = self.object
+        return context
+
+    def get_queryset(self):
+        # (-created, -id) within the photographer: bird_photographer_idx
+        return self.object.photographers.all()
 
 
 class ProfileUpdateView(LoginRequiredMixin, UpdateView):
@@ -55,12 +108,22 @@ class CustomPasswordChangeView(LoginRequiredMixin, PasswordChangeView):
 # Bird App related Views
 
 
-class BirdsNestListView(ListView):
+class BirdsNestListView(CursorPaginationMixin, ListView):
     model = Bird
     template_name = "bird/bird_list.html"
     context_object_name = "birds_list"
-    # pagination is easy
+    # keyset pagination on (-created, -id), see birds/pagination.py
     paginate_by = 9
+    approximate_count = True
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("photographer")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # vary_on of the cached cards, one cache round trip for the page
+        attach_cache_versions(context["birds_list"])
+        return context
 
 
 class BirdDetailView(LoginRequiredMixin, DetailView):
@@ -68,13 +131,37 @@ class BirdDetailView(LoginRequiredMixin, DetailView):
     template_name = "bird/bird_detail.html"
     context_object_name = "bird_detail"
 
+    def get_queryset(self):
+        return Bird.objects.select_related("photographer")
+
+    def get_object(self, queryset=None):
+        """
+        The approved thread is part of the cached fragments and only loaded
+        (Bird.approved_thread) when they are rendered again, the pending
+        items of the user are loaded here. The template must not follow
+        relations on its own (N+1).
+        """
+        bird = super().get_object(queryset).load_pending(self.request.user)
+        return attach_cache_versions([bird])[0]
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["comment_form"] = CommentForm()
-        context["reply_form"] = ReplyForm()
+        # bound ones (extra_context) when a post did not validate
+        context.setdefault("comment_form", CommentForm())
+        context.setdefault("reply_form", ReplyForm())
         return context
 
 
+def bird_detail_with_errors(request, pk, **forms):
+    """
+    The bird page again after a post whose form did not validate, the form
+    shows its errors and what was typed.
+    """
+    view = BirdDetailView(extra_context=forms)
+    view.setup(request, pk=pk)
+    return view.get(request, pk=pk)
+
+
 class BirdDetailCommentFormView(
     LoginRequiredMixin, SingleObjectMixin, FormView
 ):  # noqa: E501
@@ -94,11 +181,24 @@ class BirdDetailCommentFormView(
         form.instance.bird = self.object
         if form.instance.comment_creator == self.object.photographer:
             form.instance.comment_approved = True
-            form.save()
+            with transaction.atomic():
+                form.save()
+                Bird.objects.filter(pk=self.object.pk).adjust_counters(
+                    approved_comments=1
+                )
         else:
-            form.save()
+            with transaction.atomic():
+                form.save()
+                PendingModeration.objects.add(form.instance)
         return super().form_valid(form)
 
+    def form_invalid(self, form):
+        return bird_detail_with_errors(
+            self.request,
+            self.object.pk,
+            comment_form=form,
+        )
+
     def get_success_url(self):
         return reverse("bird_detail", kwargs={"pk": self.object.pk})
 
@@ -125,9 +225,18 @@ class BirdDetailReplyFormView(LoginRequiredMixin, SingleObjectMixin, FormView):
             form.instance.reply_approved = True
             form.save()
         else:
-            form.save()
+            with transaction.atomic():
+                form.save()
+                PendingModeration.objects.add(form.instance)
         return super().form_valid(form)
 
+    def form_invalid(self, form):
+        return bird_detail_with_errors(
+            self.request,
+            self.object.bird_id,
+            reply_form=form,
+        )
+
     def get_success_url(self):
         return reverse("bird_detail", kwargs={"pk": self.object.bird.pk})
 
@@ -137,25 +246,29 @@ class BirdDetailSimpleView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         view = BirdDetailView.as_view()
 
-        # calls model custom method to rotate image
+        # calls model custom method to rotate image (only stores the new
+        # orientation, the renditions are rebuilt by the image worker)
         if request.GET.get("name", False):
             pk = request.GET.get("pk", False)
+            own_birds = Bird.objects.filter(photographer=request.user)
             if "rotate-left" in request.GET.get("name"):
-                bird_obj = get_object_or_404(Bird, pk=pk)
-                bird_obj.rotate_left()
+                bird_obj = get_object_or_404(own_birds, pk=pk)
+                return redirect(bird_obj.rotate_left())
             elif "rotate-right" in request.GET.get("name"):
-                bird_obj = get_object_or_404(Bird, pk=pk)
-                bird_obj.rotate_right()
+                bird_obj = get_object_or_404(own_birds, pk=pk)
+                return redirect(bird_obj.rotate_right())
 
         return view(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        if request.POST.get("comment", False):
+        # an empty one is posted too, its form tells what is missing
+        if "comment" in request.POST:
             view = BirdDetailCommentFormView.as_view()
             return view(request, *args, **kwargs)
-        elif request.POST.get("reply", False):
+        elif "reply" in request.POST:
             view = BirdDetailReplyFormView.as_view()
             return view(request, *args, **kwargs)
+        return redirect("bird_detail", pk=kwargs["pk"])
 
 
 # This function view does the same as the 4 CBVs above () ####################
@@ -206,6 +319,14 @@ class BirdUpdateView(LoginRequiredMixin, UpdateView):
         "photographer_comment",
     )
 
+    def form_valid(self, form):
+        # only the edited columns: the counters, renditions and picture
+        # status may have changed (seeds, approvals, image jobs) since the
+        # form was loaded and must not be written back
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=[*form.changed_data, "modified"])
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class BirdDeleteView(LoginRequiredMixin, DeleteView):
     model = Bird
@@ -220,11 +341,66 @@ class AddBirdCreateView(LoginRequiredMixin, CreateView):
 
     # fields = ['species', 'location', 'picture', 'photographer_comment']
 
+    def get_form_class(self):
+        # the picture went straight to the bucket (PresignUploadView)
+        if "upload" in self.request.POST:
+            return DirectUploadBirdForm
+        return super().get_form_class()
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if self.get_form_class() is DirectUploadBirdForm:
+            kwargs["user"] = self.request.user
+        return kwargs
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if direct_uploads_enabled():
+            context["direct_upload_url"] = reverse("presign_upload")
+        return context
+
     def form_valid(self, form):
         form.instance.photographer = self.request.user
+        if form.cleaned_data.get("upload"):
+            # checked and moved out of the staging area by the image worker
+            form.instance.picture = form.cleaned_data["upload"]
         return super(AddBirdCreateView, self).form_valid(form)
 
 
+class PresignUploadView(LoginRequiredMixin, View):
+    """
+    Hands out a presigned POST to a staging key of the bucket so the
+    picture does not go through Django (settings.DIRECT_UPLOADS). The
+    browser announces the type and size of the file, the bucket policy
+    enforces them and the image worker checks them again.
+    Answers {"url", "fields", "upload"}, upload is the signed staging key
+    to post with the AddBirdForm.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if not direct_uploads_enabled():
+            raise Http404("Direct uploads are disabled")
+        content_type = request.POST.get("content_type")
+        if content_type not in PICTURE_CONTENT_TYPES:
+            return JsonResponse(
+                {"error": "Only JPEG, PNG, WebP and GIF pictures."}, status=400
+            )
+        size = request.POST.get("size", "")
+        if not size.isdigit() or not 0 < int(size) <= MAX_PICTURE_SIZE:
+            return JsonResponse({"error": "File too large."}, status=400)
+        name = staging_name(content_type)
+        post = default_storage.presigned_post(
+            name, content_type, MAX_PICTURE_SIZE, UPLOAD_EXPIRES
+        )
+        return JsonResponse(
+            {
+                "url": post["url"],
+                "fields": post["fields"],
+                "upload": sign_upload(request.user, name),
+            }
+        )
+
+
 # comment cbvs
 
 
@@ -234,6 +410,10 @@ class EditCommentUpdateView(LoginRequiredMixin, UpdateView):
     fields = ("comment",)
     template_name = "comment_reply/comment_reply_update.html"
 
+    def get_queryset(self):
+        # only the creator edits a comment
+        return Comment.objects.filter(comment_creator=self.request.user)
+
     def get_success_url(self):
         return reverse("bird_detail", kwargs={"pk": self.object.bird.pk})  # noqa: E501
 
@@ -243,12 +423,61 @@ class EditReplyUpdateView(LoginRequiredMixin, UpdateView):
     fields = ("reply",)
     template_name = "comment_reply/comment_reply_update.html"
 
+    def get_queryset(self):
+        return Reply.objects.filter(reply_creator=self.request.user)
+
     def get_success_url(self):
         return reverse(
             "bird_detail", kwargs={"pk": self.object.comment.bird.pk}
         )  # noqa: E501
 
 
+class ModerationQueueView(LoginRequiredMixin, FormView):
+    """
+    The comments and replies waiting for the photographer's approval on all
+    of their birds, oldest first, read from their inbox (PendingModeration).
+    The checked ones are approved or deleted with one statement per table,
+    the ownership check is part of its WHERE clause (ids of someone else's
+    comments are ignored).
+    """
+
+    template_name = "comment_reply/moderation_queue.html"
+    form_class = ModerationForm
+    success_url = reverse_lazy("moderation_queue")
+    # the next ones show up once these are cleared
+    queue_size = 100
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["pending"] = (
+            PendingModeration.objects.filter(photographer=self.request.user)
+            .select_related(
+                "bird", "creator", "comment", "reply__comment__comment_creator"
+            )
+            .order_by("created")[: self.queue_size]
+        )
+        return context
+
+    def form_valid(self, form):
+        user = self.request.user
+        comments = Comment.objects.moderated_by(user).filter(
+            pk__in=form.cleaned_data["comments"], comment_approved=False
+        )
+        replies = Reply.objects.moderated_by(user).filter(
+            pk__in=form.cleaned_data["replies"], reply_approved=False
+        )
+        if form.cleaned_data["action"] == ModerationForm.APPROVE:
+            comments.approve()
+            replies.approve()
+        else:
+            with transaction.atomic():
+                # their inbox rows go with them
+                comments.delete()
+                replies.delete()
+                PendingModeration.objects.recount([user.pk])
+        return super().form_valid(form)
+
+
 # Seed function view
 # def add_remove_seed_function_view(request, *args, **kwargs):
 #     """
@@ -279,36 +508,30 @@ class EditReplyUpdateView(LoginRequiredMixin, UpdateView):
 #             return redirect('bird_detail', pk=bird.pk)
 
 
-class Seed_Add_Remove_View(View):
-    def get(self, request, *args, **kwargs):
-        bird = get_object_or_404(Bird, pk=kwargs["pk"])
-        seeded = (
-            Seed.objects.values_list("seeded")
-            .filter(seeder__username=request.user)
-            .filter(bird__species=bird.species)
-        )
-        if seeded:
-            seed = Seed.objects.filter(
-                seeder__username=self.request.user
-            ).filter(  # noqa: E501
-                bird__species=bird.species
-            )
-            seed.delete()
-            return redirect("bird_detail", pk=bird.pk)
-        else:
-            seed = Seed()
-            seed.seeded = True
-            seed.bird = bird
-            seed.seeder = self.request.user
-            seed.save()
-            return redirect("bird_detail", pk=bird.pk)
-        return super().get(request, *args, **kwargs)
+class Seed_Add_Remove_View(LoginRequiredMixin, View):
+    """
+    Seeds / unseeds a bird (POST). The fetch() in base.js asks for JSON and
+    updates the counter in place, a plain form post is redirected back.
+    """
+
+    def post(self, request, *args, **kwargs):
+        toggled = Seed.objects.toggle(request.user, kwargs["pk"])
+        if toggled is None:
+            raise Http404("No bird found matching the query")
+        seeded, seed_count = toggled
+        if "application/json" in request.headers.get("Accept", ""):
+            return JsonResponse({"seeded": seeded, "seed_count": seed_count})
+        return redirect("bird_detail", pk=kwargs["pk"])
 
 
 # search
 
 
-class SearchResultsListView(LoginRequiredMixin, ListView):
+class SearchResultsListView(
+    LoginRequiredMixin,
+    CursorPaginationMixin,
+    ListView,
+):
     model = Bird
     template_name = "search_results.html"
     paginate_by = 10
@@ -316,40 +539,14 @@ class SearchResultsListView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         """
         A reminder that queryset is equals to Model.objects.all()
-        Always add "?q={{ request.GET.q }}&page={{ page_obj.previous_page_number }}" in pagination.  # noqa: E501
+        pagination.html keeps ?q= and ?order_by= when following a cursor.
+        The filtering and ordering are shared with the JSON API, see
+        BirdQuerySet.search_results.
         """
         query = self.request.GET.get("q")  # search result
         order_by = self.request.GET.get("order_by")  # order by result
-        queryset = super().get_queryset()  # queryset = Birds.objects
-
-        # to be fixed
-        # if search term is entered it will update the queryset from all to specific  # noqa: E501
-        if query:
-            queryset = queryset.filter(
-                Q(photographer__username__icontains=query)
-                | Q(species__icontains=query)
-                | Q(photographer_comment__icontains=query)
-                | Q(location__icontains=query)
-            )
-        # if order_by link is clicked it will order queryset accordingly
-        # using annotate (hidden Django's jewel)
-        if order_by:
-            if "comment" in order_by:
-                queryset = (
-                    queryset.filter(comments__comment_approved=True)
-                    .annotate(num_comment=Count("comments"))
-                    .order_by("-num_comment")
-                )
-            elif "seed" in order_by:
-                queryset = queryset.annotate(num_seed=Count("seeds")).order_by(
-                    "-num_seed"
-                )
-            elif "species" in order_by:
-                queryset = queryset.order_by("species")
-            elif "photographer" in order_by:
-                queryset = queryset.order_by("photographer__username")
-
-        return queryset
+        queryset = super().get_queryset().select_related("photographer")
+        return queryset.search_results(query, order_by)
 
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -362,30 +559,49 @@ class SearchResultsListView(LoginRequiredMixin, ListView):
 # protect these with login_required decorator
 
 
+@login_required
 def approve_comment(request, pk):
-    comment = get_object_or_404(Comment, pk=pk)
-    comment.comment_approved = True
-    comment.save()
-    return redirect("bird_detail", pk=comment.bird.pk)
+    moderated = Comment.objects.moderated_by(request.user)
+    comment = get_object_or_404(moderated, pk=pk)
+    # only counts a comment that is still pending
+    Comment.objects.filter(pk=pk).approve()
+    return redirect("bird_detail", pk=comment.bird_id)
 
 
+@login_required
 def remove_comment(request, pk):
-    comment = get_object_or_404(Comment, pk=pk)
-    comment_pk = comment.bird.pk
-    comment.delete()
+    removable = Comment.objects.removable_by(request.user)
+    comment = get_object_or_404(removable, pk=pk)
+    comment_pk = comment.bird_id
+    with transaction.atomic():
+        comment.delete()
+        if comment.comment_approved:
+            Bird.objects.filter(pk=comment_pk).adjust_counters(
+                approved_comments=-1,
+            )
+        # the comment or its pending replies may have been in the inbox
+        PendingModeration.objects.recount(
+            Bird.objects.filter(pk=comment_pk).values("photographer")
+        )
     return redirect("bird_detail", pk=comment_pk)
 
 
+@login_required
 def approve_reply(request, pk):
-    reply = get_object_or_404(Reply, pk=pk)
-    reply_pk = reply.comment.bird.pk
-    reply.reply_approved = True
-    reply.save()
-    return redirect("bird_detail", pk=reply_pk)
+    moderated = Reply.objects.moderated_by(request.user)
+    reply = get_object_or_404(moderated.select_related("comment"), pk=pk)
+    Reply.objects.filter(pk=pk).approve()
+    return redirect("bird_detail", pk=reply.comment.bird_id)
 
 
+@login_required
 def remove_reply(request, pk):
-    reply = get_object_or_404(Reply, pk=pk)
+    removable = Reply.objects.removable_by(request.user)
+    reply = get_object_or_404(removable, pk=pk)
     reply_pk = reply.comment.bird.pk
-    reply.delete()
+    with transaction.atomic():
+        reply.delete()
+        if not reply.reply_approved:
+            photographer_id = reply.comment.bird.photographer_id
+            PendingModeration.objects.recount([photographer_id])
     return redirect("bird_detail", pk=reply_pk)
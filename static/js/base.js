@@ -5,8 +5,17 @@ function myFunction() {
 
 // function to hide/display reply box on bird_details
 // receives comment id to know under which one to perform action
+// the page has a single reply box, it is moved under that comment first
 function myFunc(reply_id) {
     var x = document.getElementById(reply_id);
+    var box = document.getElementById('reply_box');
+    if (box.parentNode !== x) {
+        x.appendChild(box);
+        box.querySelector('form').action = x.dataset.action;
+        box.style.display = 'block';
+        x.style.display = 'block';
+        return;
+    }
     if (x.style.display == "none") {
         x.style.display = 'block';
     } else {
@@ -25,4 +34,114 @@ function myJS(item) {
 function rotate_image(){
 	var img=document.getElementById('bird_image');
 	img.setAttribute('style','transform:rotate(90deg)');
-}
\ No newline at end of file
+}
+
+// seed / unseed a bird without reloading the bird_detail page
+// the view answers {"seeded": bool, "seed_count": int}
+function seed_toggle(event) {
+    event.preventDefault();
+    var form = event.currentTarget;
+    var button = form.querySelector('button');
+    button.disabled = true;
+    fetch(form.action, {
+        method: 'POST',
+        headers: {
+            'Accept': 'application/json',
+            'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+        },
+        credentials: 'same-origin',
+    })
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function (data) {
+            form.querySelector('.seed_count').textContent = data.seed_count;
+            form.classList.toggle('seeded', data.seeded);
+        })
+        .catch(function () {
+            // fall back to the regular form post
+            form.submit();
+        })
+        .finally(function () {
+            button.disabled = false;
+        });
+}
+
+// add_bird: sends the picture straight to the bucket with a presigned POST
+// (settings.DIRECT_UPLOADS), the form then only carries the signed key
+function direct_upload(event) {
+    var form = event.currentTarget;
+    var input = form.querySelector('input[type=file]');
+    if (!input.files.length) {
+        return;
+    }
+    event.preventDefault();
+    var file = input.files[0];
+    var button = form.querySelector('button');
+    button.disabled = true;
+    var presign = new FormData();
+    presign.append('content_type', file.type);
+    presign.append('size', file.size);
+    fetch(form.dataset.directUpload, {
+        method: 'POST',
+        headers: {
+            'Accept': 'application/json',
+            'X-CSRFToken': form.querySelector('[name=csrfmiddlewaretoken]').value,
+        },
+        body: presign,
+        credentials: 'same-origin',
+    })
+        .then(function (response) {
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+            return response.json();
+        })
+        .then(function (data) {
+            var upload = new FormData();
+            Object.keys(data.fields).forEach(function (name) {
+                upload.append(name, data.fields[name]);
+            });
+            // S3 wants the file after the policy fields
+            upload.append('file', file);
+            return fetch(data.url, {method: 'POST', body: upload}).then(
+                function (response) {
+                    if (!response.ok) {
+                        throw new Error(response.status);
+                    }
+                    var token = form.querySelector('[name=upload]');
+                    if (!token) {
+                        token = document.createElement('input');
+                        token.type = 'hidden';
+                        token.name = 'upload';
+                        form.appendChild(token);
+                    }
+                    token.value = data.upload;
+                    // the bytes are not sent a second time
+                    input.disabled = true;
+                }
+            );
+        })
+        .catch(function () {
+            // fall back to the regular multipart post
+            var token = form.querySelector('[name=upload]');
+            if (token) {
+                token.remove();
+            }
+        })
+        .finally(function () {
+            form.submit();
+        });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    document.querySelectorAll('.seed_form').forEach(function (form) {
+        form.addEventListener('submit', seed_toggle);
+    });
+    document.querySelectorAll('form[data-direct-upload]').forEach(function (form) {
+        form.addEventListener('submit', direct_upload);
+    });
+});
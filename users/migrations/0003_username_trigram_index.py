@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:55
+
+from django.db import migrations
+
+# BirdQuerySet.search finds photographers with username__icontains, which
+# PostgreSQL runs as UPPER(username::text) LIKE UPPER('%...%'): only a
+# trigram index on that expression avoids scanning every user.
+USERNAME_TRGM_SQL = """
+CREATE INDEX user_username_trgm_idx ON users_customuser
+    USING gin ((UPPER(username::text)) gin_trgm_ops);
+"""
+
+DROP_USERNAME_TRGM_SQL = "DROP INDEX IF EXISTS user_username_trgm_idx;"
+
+
+def create_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(USERNAME_TRGM_SQL)
+
+
+def drop_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_USERNAME_TRGM_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0002_alter_customuser_first_name"),
+        # pg_trgm is created by the birds search migration, which stops
+        # with an explanation when it cannot be
+        ("birds", "0006_bird_search_vector"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_username_index, drop_username_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0003_username_trigram_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="pending_moderation_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
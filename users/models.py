@@ -7,6 +7,7 @@ from django.utils import timezone
 
 from birds.utils import file_size
 
+
 # Create your models here.
 class CustomUser(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -20,6 +21,12 @@ class CustomUser(AbstractUser):
         max_length=600, blank=True, default="Enter a nice description here"
     )
     registered_at = models.DateField(auto_now_add=True)
+    # size of the moderation inbox (birds.PendingModeration), read by the nav
+    # badge straight from request.user
+    pending_moderation_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
 
     def get_absolute_url(self):
         return reverse("profile_detail", kwargs={"pk": self.pk})
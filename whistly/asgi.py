@@ -3,6 +3,11 @@ ASGI config for whistly project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Served with ASYNC_VIEWS=True (async read views and media streaming, see
+pages/async_views.py):
+
+    uvicorn whistly.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
@@ -0,0 +1,66 @@
+"""
+Content-addressed media storage on the local file system. The S3 backends
+are in whistly/storage_backends.py, which needs boto3 (django-storages[s3]).
+"""
+
+import hashlib
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+# files whose name changes with their content can be cached forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ContentAddressedStorageMixin:
+    """
+    Stores every file under the SHA-256 of its content,
+    <top directory>/<first 2 hex digits>/<digest><extension>, so identical
+    files (the same picture uploaded twice, the renditions of two copies)
+    are stored once: saving content that is already there only returns its
+    name.
+
+    The storage does not know who uses a file, birds.models.StoredFile
+    counts the references and deletes a file with the last one.
+    """
+
+    hashed_name_re = re.compile(
+        r"^(?:[^/]+/)?[0-9a-f]{2}/[0-9a-f]{64}(?:\.\w+)?$",
+    )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def hashed_name(self, name, content):
+        """
+        The name content is stored under, name only gives the top directory
+        and the extension.
+        """
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        name = name.replace("\\", "/")
+        directory = name.split("/", 1)[0] if "/" in name else ""
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def is_hashed_name(self, name):
+        return bool(self.hashed_name_re.match(name))
+
+
+class DeduplicatedFileSystemStorage(
+    ContentAddressedStorageMixin,
+    FileSystemStorage,
+):
+    pass
@@ -0,0 +1,246 @@
+"""
+Request level performance metrics (settings.PERFORMANCE_METRICS): wall
+time, database queries and their time, template rendering and image
+processing of every request.
+
+Each response gets a Server-Timing header (shown by the browser dev tools)
+and the totals per view are served in the Prometheus text format by
+metrics_view(). The totals are kept per process, with several gunicorn
+workers every scrape sees the worker that answered it.
+
+When the setting is off the middleware is not loaded and timer() only
+reads a context variable.
+"""
+
+import hmac
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+# upper bounds (seconds) of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Server-Timing metric name: description
+PHASES = {
+    "db": "Database",
+    "tpl": "Templates",
+    "img": "Image processing",
+}
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.queries = 0
+
+
+@contextmanager
+def timer(phase):
+    """
+    Adds the time spent in the block to a phase of the current request, a
+    no-op outside a measured request (image worker, management commands).
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[phase] += time.perf_counter() - start
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper counting the queries of the request and the
+    time spent waiting for them.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.metrics.durations["db"] += time.perf_counter() - start
+            self.metrics.queries += 1
+
+
+class Registry:
+    """
+    Totals per view since the process started.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(
+            lambda: {
+                "requests": 0,
+                "seconds": 0.0,
+                "buckets": [0] * len(DURATION_BUCKETS),
+                "queries": 0,
+                "phases": defaultdict(float),
+            }
+        )
+
+    def record(self, view, status, metrics, duration):
+        with self.lock:
+            totals = self.views[(view, status // 100)]
+            totals["requests"] += 1
+            totals["seconds"] += duration
+            for position, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    totals["buckets"][position] += 1
+            totals["queries"] += metrics.queries
+            for phase, seconds in metrics.durations.items():
+                totals["phases"][phase] += seconds
+
+    def render(self):
+        histogram = "whistly_request_duration_seconds"
+        lines = [
+            f"# HELP {histogram} Wall time of the requests.",
+            f"# TYPE {histogram} histogram",
+        ]
+        with self.lock:
+            views = sorted(
+                (key, dict(totals, phases=dict(totals["phases"])))
+                for key, totals in self.views.items()
+            )
+        views = [
+            (f'view="{view}",status="{status}xx"', totals)
+            for (view, status), totals in views
+        ]
+        for labels, totals in views:
+            bounds = [*DURATION_BUCKETS, "+Inf"]
+            counts = [*totals["buckets"], totals["requests"]]
+            for bound, count in zip(bounds, counts):
+                bucket = f'{histogram}_bucket{{{labels},le="{bound}"}}'
+                lines.append(f"{bucket} {count}")
+            lines += [
+                f"{histogram}_sum{{{labels}}} {totals['seconds']:.6f}",
+                f"{histogram}_count{{{labels}}} {totals['requests']}",
+            ]
+        queries = "whistly_db_queries_total"
+        lines += [
+            f"# HELP {queries} Database queries run by the requests.",
+            f"# TYPE {queries} counter",
+        ]
+        for labels, totals in views:
+            lines.append(f"{queries}{{{labels}}} {totals['queries']}")
+        phases = "whistly_phase_seconds_total"
+        lines += [
+            f"# HELP {phases} Time of the requests spent in the database, "
+            "templates and image processing.",
+            f"# TYPE {phases} counter",
+        ]
+        for labels, totals in views:
+            for phase in PHASES:
+                seconds = totals["phases"].get(phase, 0.0)
+                point = f'{phases}{{{labels},phase="{phase}"}}'
+                lines.append(f"{point} {seconds:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class PerformanceMetricsMiddleware:
+    """
+    Measures every request (first in MIDDLEWARE, so the time of the other
+    middleware and of the cached pages is included) and adds the
+    Server-Timing header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    timer = QueryTimer(metrics)
+                    stack.enter_context(connection.execute_wrapper(timer))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        duration = time.perf_counter() - metrics.start
+
+        registry.record(
+            self.view_name(request), response.status_code, metrics, duration
+        )
+        timing = self.server_timing(metrics, duration)
+        response.headers["Server-Timing"] = timing
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Called right before the TemplateResponse is rendered, the callback
+        right after.
+        """
+        metrics = current_metrics.get()
+        if metrics is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                metrics.durations["tpl"] += time.perf_counter() - start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        # the anonymous page cache answers before the url is resolved
+        match = request.resolver_match
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return "unresolved"
+        return match.view_name
+
+    @staticmethod
+    def server_timing(metrics, duration):
+        entries = [f"app;dur={duration * 1000:.1f}"]
+        for phase, description in PHASES.items():
+            if phase in metrics.durations:
+                if phase == "db":
+                    description = f"{metrics.queries} queries"
+                entries.append(
+                    f"{phase};dur={metrics.durations[phase] * 1000:.1f};"
+                    f'desc="{description}"'
+                )
+        return ", ".join(entries)
+
+
+def metrics_view(request):
+    """
+    The totals of this process in the Prometheus text format, for a
+    scraper sending PERFORMANCE_METRICS_TOKEN as a bearer token (nobody
+    gets them without a token).
+    """
+    token = settings.PERFORMANCE_METRICS_TOKEN
+    sent = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(sent, f"Bearer {token}"):
+        raise PermissionDenied
+    return HttpResponse(
+        registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
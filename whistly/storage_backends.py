@@ -1,4 +1,11 @@
+from botocore.exceptions import ClientError
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from whistly.content_storage import (
+    IMMUTABLE_CACHE_CONTROL,
+    ContentAddressedStorageMixin,
+)
 
 
 class MediaStorage(S3Boto3Storage):
@@ -8,3 +15,52 @@ class MediaStorage(S3Boto3Storage):
 
     location = "media"
     file_overwrite = False
+
+    def presigned_post(self, name, content_type, max_size, expires_in):
+        """
+        Url and form fields of a browser POST straight to the bucket. The
+        policy pins the key and the content type and makes S3 itself refuse
+        bodies bigger than max_size. The bucket needs a CORS rule allowing
+        POST from the site.
+        """
+        return self.connection.meta.client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=self._normalize_name(clean_name(name)),
+            Fields={"Content-Type": content_type},
+            Conditions=[
+                {"Content-Type": content_type},
+                ["content-length-range", 1, max_size],
+            ],
+            ExpiresIn=expires_in,
+        )
+
+
+class DeduplicatedMediaStorage(ContentAddressedStorageMixin, MediaStorage):
+    # a key already there holds the same bytes, no HEAD to find a free name
+    file_overwrite = True
+
+    def exists(self, name):
+        # S3Storage answers False for any name when file_overwrite is on, the
+        # save of the mixin needs the truth to skip content already stored
+        try:
+            self.connection.meta.client.head_object(
+                Bucket=self.bucket_name,
+                Key=self._normalize_name(clean_name(name)),
+            )
+        except ClientError as error:
+            if error.response["ResponseMetadata"]["HTTPStatusCode"] == 404:
+                return False
+            raise
+        return True
+
+    def get_available_name(self, name, max_length=None):
+        # the content-addressed name is the one to write to, taken or not
+        return name
+
+    def get_object_parameters(self, name):
+        # set on upload, S3 and any CDN in front of it send it back as is
+        # (AWS_S3_OBJECT_PARAMETERS may still override it)
+        return {
+            "CacheControl": IMMUTABLE_CACHE_CONTROL,
+            **super().get_object_parameters(name),
+        }
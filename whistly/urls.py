@@ -15,9 +15,9 @@ Including another URLconf
 """
 
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.urls import include, path, re_path
 
 urlpatterns = [
     path("control-room/", admin.site.urls),
@@ -26,9 +26,28 @@ urlpatterns = [
     # authentication
     path("accounts/", include("allauth.urls")),
     # path('users/', include('django.contrib.auth.urls'))
-] + static(
-    settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-)  # this is seencial for the right handling of media
+]
+
+# only the local media storage, the urls of S3 point at the bucket
+local_media = isinstance(default_storage, FileSystemStorage)
+if local_media and settings.MEDIA_URL.startswith("/"):
+    # conditional, range-capable and cached, DEBUG or not (pages/media.py)
+    if settings.ASYNC_VIEWS:
+        from pages.async_views import serve_media
+    else:
+        from pages.media import serve_media
+
+    urlpatterns += [
+        re_path(
+            rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$",
+            serve_media,
+        )
+    ]
+
+if settings.PERFORMANCE_METRICS and settings.PERFORMANCE_METRICS_TOKEN:
+    from whistly.metrics import metrics_view
+
+    urlpatterns.insert(0, path("metrics/", metrics_view, name="metrics"))
 
 if settings.DEBUG:
     import debug_toolbar